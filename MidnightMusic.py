@@ -1,76 +1,36 @@
 import os
-import sys
 import threading
-import requests
+import importlib
+import multiprocessing
 import customtkinter as ctk
 from tkinter import messagebox, filedialog
-import yt_dlp
-from PIL import Image
-from io import BytesIO
-import random
 import time
-import json
+import itertools
 
-# =============================================================================
-# ⚙️ CONFIGURAÇÕES DE DIRETÓRIO E FFMPEG
-# =============================================================================
+from midnight_core import (
+    CONFIG, DEFAULT_CONFIG, DEFAULT_DOWNLOAD_PATH, FFMPEG_EXE, save_config, get_download_path,
+    ensure_download_path, build_download_opts, DownloaderSession, MAX_CONCURRENT_DOWNLOADS,
+    SCHEDULER, PRIORITY_INTERACTIVE, PRIORITY_NORMAL, PRIORITY_BULK, JobCancelled,
+    JobJournal, find_unfinished_jobs, LIBRARY, RATE_LIMITER, JobStats,
+    TrackRecorder, PLAYLIST_CACHE, TrackTable, analyze_links, resolve_queries, search_query, find_in_library,
+    scan_library, run_download_job, stream_feed, fetch_cover, export_covers, cover_items_from_entries,
+    cover_items_from_queries, prepare_cover, AlbumArtCache, AUDIO_CODECS, AUDIO_CODEC_LABELS, audio_codec,
+)
 
-# Caminho padrão inicial
-DEFAULT_DOWNLOAD_PATH = r"D:\Músicas\Spotify"
+ensure_download_path()
 
-# Caminho para o arquivo de configuração
-if getattr(sys, 'frozen', False):
-    APPLICATION_PATH = os.path.dirname(sys.executable)
-else:
-    APPLICATION_PATH = os.path.dirname(os.path.abspath(__file__))
+# Módulos pesados (o yt-dlp sozinho leva segundos em máquinas antigas): ficam
+# fora do caminho até a janela aparecer e são carregados em segundo plano logo
+# depois, ou na hora, por quem usar primeiro
+HEAVY_MODULES = ("yt_dlp", "requests", "PIL.Image")
 
-CONFIG_FILE = os.path.join(APPLICATION_PATH, "midnight_config.json")
 
-# Carrega configuração salva ou usa padrão
-def load_config():
-    default_config = {
-        "download_path": DEFAULT_DOWNLOAD_PATH,
-        "delay_between_songs": 5,
-        "retry_attempts": 3
-    }
-    
-    if os.path.exists(CONFIG_FILE):
+def prewarm_imports():
+    for name in HEAVY_MODULES:
         try:
-            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                # Atualiza com valores padrão para novas chaves
-                for key, value in default_config.items():
-                    if key not in config:
-                        config[key] = value
-                return config
-        except:
-            return default_config
-    return default_config
-
-def save_config(config):
-    try:
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=4, ensure_ascii=False)
-    except:
-        pass
-
-# Carrega configuração atual
-config = load_config()
-DOWNLOAD_PATH = config["download_path"]
-
-# Caminho exato para o executável
-FFMPEG_EXE = os.path.join(APPLICATION_PATH, "ffmpeg.exe")
-FFPROBE_EXE = os.path.join(APPLICATION_PATH, "ffprobe.exe")
-
-# Cria a pasta de músicas se não existir
-if not os.path.exists(DOWNLOAD_PATH):
-    try: 
-        os.makedirs(DOWNLOAD_PATH)
-    except: 
-        # Se não conseguir criar, volta para a pasta do programa
-        DOWNLOAD_PATH = APPLICATION_PATH
-        config["download_path"] = DOWNLOAD_PATH
-        save_config(config)
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"Erro ao pré-carregar {name}: {e}")
 
 # =============================================================================
 # 🎨 TEMA
@@ -89,6 +49,275 @@ FONT_SMALL = (FONT_FAMILY, 10)
 
 ctk.set_appearance_mode("Dark")
 
+# =============================================================================
+# 📬 FILA DE ATUALIZAÇÕES DA INTERFACE
+# =============================================================================
+
+# Intervalo entre quadros em que a fila é aplicada (~20 fps)
+UI_FRAME_MS = 50
+
+
+class UIUpdateBus:
+    """Fila de atualizações de interface vinda das threads de trabalho.
+
+    O Tk só pode ser tocado pela thread principal: as threads chamam post()
+    e o mainloop aplica tudo a cada quadro com drain(). Atualizações com a
+    mesma chave se sobrepõem (só a última é aplicada); sem chave, nenhuma
+    é descartada (diálogos, fim de job).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._keyed = {}
+        self._ordered = []
+
+    def post(self, fn, key=None):
+        with self._lock:
+            item = (next(self._seq), fn)
+            if key is None:
+                self._ordered.append(item)
+            else:
+                self._keyed[key] = item
+
+    def drain(self):
+        """Aplica as atualizações pendentes na ordem em que chegaram"""
+        with self._lock:
+            pending = self._ordered + list(self._keyed.values())
+            self._ordered = []
+            self._keyed = {}
+        pending.sort(key=lambda item: item[0])
+        for _, fn in pending:
+            try:
+                fn()
+            except Exception as e:
+                print(f"Erro ao atualizar a interface: {e}")
+        return len(pending)
+
+
+# =============================================================================
+# 📜 LISTA VIRTUAL DE MÚSICAS
+# =============================================================================
+
+class VirtualTrackList(ctk.CTkFrame):
+    """Lista com checkbox que só cria widgets para as linhas visíveis.
+
+    A seleção não mora nos checkboxes: é um valor padrão mais o conjunto dos
+    índices que fogem dele, então selecionar/desmarcar tudo é O(1) e a lista
+    aguenta dezenas de milhares de músicas. Os títulos e as URLs são lidos
+    direto da TrackTable da análise, sem cópia.
+    """
+
+    ROW_HEIGHT = 34
+    UNKNOWN_TITLE = "Música desconhecida"
+
+    def __init__(self, master, on_change=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.on_change = on_change
+        self.table = TrackTable()
+        self._default = True     # estado de quem não está em _flipped
+        self._flipped = set()
+        self._view = []          # índices que passam no filtro, na ordem original
+        self._filtered = False
+        self._top = 0
+        self._rows = []          # (frame, checkbox, label)
+        self._visible_rows = 0
+        self._filter_job = None
+
+        self.search_entry = ctk.CTkEntry(self, placeholder_text="Filtrar por título...",
+                                         fg_color=THEME["dark_gray"], border_width=0, height=30)
+        self.search_entry.pack(fill="x", padx=5, pady=(5, 0))
+        self.search_entry.bind("<KeyRelease>", lambda _: self._schedule_filter())
+
+        body = ctk.CTkFrame(self, fg_color="transparent")
+        body.pack(fill="both", expand=True, padx=5, pady=5)
+        self.scrollbar = ctk.CTkScrollbar(body, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.rows_frame = ctk.CTkFrame(body, fg_color="transparent")
+        self.rows_frame.pack(side="left", fill="both", expand=True)
+        self.rows_frame.bind("<Configure>", self._on_resize)
+        self._bind_wheel(self.rows_frame)
+
+    # --- dados -----------------------------------------------------------
+    def set_table(self, table):
+        self.table = table
+        self._default = True
+        self._flipped = set()
+        self._top = 0
+        self._apply_filter()
+
+    def tracks_appended(self, start, selected=True):
+        """A tabela ganhou músicas a partir de `start`: mostra sem mexer na seleção, no filtro nem na rolagem"""
+        end = len(self.table)
+        if selected != self._default:
+            self._flipped.update(range(start, end))
+        if self._filtered:
+            self._view.extend(self._matching(self.search_entry.get().strip().lower(), start, end))
+        else:
+            self._view = range(end)
+        self._render()
+        self._changed()
+
+    def title(self, index):
+        return self.table.titles[index] or self.UNKNOWN_TITLE
+
+    @property
+    def track_count(self):
+        return len(self.table)
+
+    def is_selected(self, index):
+        return (index in self._flipped) != self._default
+
+    def set_selected(self, index, selected):
+        if selected == self._default:
+            self._flipped.discard(index)
+        else:
+            self._flipped.add(index)
+
+    def selected_count(self):
+        if self._default:
+            return len(self.table) - len(self._flipped)
+        return len(self._flipped)
+
+    def selected_urls(self):
+        return [self.table.url(i) for i in range(len(self.table)) if self.is_selected(i)]
+
+    def unselected_keys(self):
+        """Ids (ou URLs) das músicas desmarcadas"""
+        return [self.table.key(i) for i in range(len(self.table)) if not self.is_selected(i)]
+
+    def select_all(self):
+        self._set_all(True)
+
+    def deselect_all(self):
+        self._set_all(False)
+
+    def _set_all(self, selected):
+        if self._filtered:
+            # Com filtro, vale só para o que está aparecendo
+            for index in self._view:
+                self.set_selected(index, selected)
+        else:
+            self._default = selected
+            self._flipped = set()
+        self._render()
+        self._changed()
+
+    def refresh(self):
+        """Redesenha depois de mudanças feitas com set_selected()"""
+        self._render()
+        self._changed()
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change(self)
+
+    # --- filtro ----------------------------------------------------------
+    def _schedule_filter(self):
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(150, self._apply_filter)
+
+    def _apply_filter(self):
+        self._filter_job = None
+        term = self.search_entry.get().strip().lower()
+        self._filtered = bool(term)
+        if term:
+            self._view = self._matching(term, 0, len(self.table))
+        else:
+            self._view = range(len(self.table))
+        self._top = 0
+        self._render()
+        self._changed()
+
+    def _matching(self, term, start, end):
+        return [i for i in range(start, end) if term in self.title(i).lower()]
+
+    @property
+    def visible_count(self):
+        return len(self._view)
+
+    # --- rolagem e desenho -----------------------------------------------
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel, add="+")
+        widget.bind("<Button-4>", self._on_wheel, add="+")
+        widget.bind("<Button-5>", self._on_wheel, add="+")
+
+    def _on_wheel(self, event):
+        if getattr(event, "num", None) == 4:
+            step = -3
+        elif getattr(event, "num", None) == 5:
+            step = 3
+        else:
+            step = -3 if event.delta > 0 else 3
+        self._scroll_to(self._top + step)
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self._scroll_to(int(float(value) * len(self._view)))
+        elif action == "scroll":
+            step = int(value) * (self._visible_rows if unit == "pages" else 1)
+            self._scroll_to(self._top + step)
+
+    def _scroll_to(self, top):
+        max_top = max(0, len(self._view) - self._visible_rows)
+        top = max(0, min(int(top), max_top))
+        if top != self._top:
+            self._top = top
+            self._render()
+
+    def _on_resize(self, event):
+        rows = max(1, int(event.height // self._apply_widget_scaling(self.ROW_HEIGHT)))
+        if rows != self._visible_rows:
+            self._visible_rows = rows
+            while len(self._rows) < rows:
+                self._rows.append(self._create_row(len(self._rows)))
+            self._scroll_to(self._top)
+            self._render()
+
+    def _create_row(self, slot):
+        frame = ctk.CTkFrame(self.rows_frame, fg_color=THEME["dark_gray"], height=self.ROW_HEIGHT - 4)
+        frame.pack_propagate(False)
+        chk = ctk.CTkCheckBox(frame, text="", fg_color=THEME["green"], hover_color=THEME["green_hover"], width=20,
+                              command=lambda: self._on_row_toggle(slot))
+        chk.pack(side="left", padx=5)
+        label = ctk.CTkLabel(frame, text="", text_color=THEME["fg"], anchor="w")
+        label.pack(side="left", fill="x", expand=True, padx=10)
+        for widget in (frame, label):
+            self._bind_wheel(widget)
+        label.bind("<Button-1>", lambda _: chk.toggle())
+        return frame, chk, label
+
+    def _on_row_toggle(self, slot):
+        position = self._top + slot
+        if position < len(self._view):
+            index = self._view[position]
+            self.set_selected(index, bool(self._rows[slot][1].get()))
+            self._changed()
+
+    def _render(self):
+        total = len(self._view)
+        for slot, (frame, chk, label) in enumerate(self._rows):
+            position = self._top + slot
+            if slot < self._visible_rows and position < total:
+                index = self._view[position]
+                title = self.title(index)
+                # Limita o tamanho do título para não quebrar o layout
+                label.configure(text=title[:70] + "..." if len(title) > 70 else title)
+                chk.select() if self.is_selected(index) else chk.deselect()
+                if not frame.winfo_manager():
+                    frame.pack(fill="x", pady=2)
+            elif frame.winfo_manager():
+                frame.pack_forget()
+
+        if total:
+            first = self._top / total
+            last = min(1.0, (self._top + self._visible_rows) / total)
+            self.scrollbar.set(first, last)
+        else:
+            self.scrollbar.set(0, 1)
+
+
 class MidnightMusicSuite(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -98,6 +327,10 @@ class MidnightMusicSuite(ctk.CTk):
         
         self.grid_columnconfigure(1, weight=1)
         self.grid_rowconfigure(0, weight=1)
+        
+        # Toda atualização vinda de threads passa por aqui
+        self.ui = UIUpdateBus()
+        self.after(UI_FRAME_MS, self._pump_ui)
 
         # --- SIDEBAR ---
         self.sidebar = ctk.CTkFrame(self, width=220, fg_color=THEME["sidebar"], corner_radius=0)
@@ -120,15 +353,36 @@ class MidnightMusicSuite(ctk.CTk):
         self.container = ctk.CTkFrame(self, fg_color="transparent")
         self.container.grid(row=0, column=1, sticky="nsew", padx=20, pady=20)
 
+        # Cada aba é montada na primeira vez que aparece (ver show_frame)
         self.frames = {}
-        self.setup_single_frame()
-        self.setup_playlist_frame()
-        self.setup_cover_frame()
-        self.setup_settings_frame()  # Nova aba de configurações
+        self.playlist_downloading = False
+        self.playlist_job = None  # Job do SCHEDULER do download em lote atual
+        self.last_entries = TrackTable()  # Resultado da última análise (também usado pela aba de capas)
+        self.list_generation = 0  # Muda a cada lista nova; revalidações de listas antigas são descartadas
         self.show_frame("single")
         
-        # Validação forçada ao iniciar
-        self.check_system_integrity()
+        # Rótulos e campos acompanham a configuração sem precisar reler o arquivo
+        CONFIG.subscribe(self._on_config_changed)
+        
+        # Validação forçada ao iniciar (depois que a janela já foi desenhada)
+        self.after_idle(self.check_system_integrity)
+        
+        # yt-dlp, requests e Pillow carregam enquanto o usuário olha a janela
+        self.after_idle(lambda: threading.Thread(target=prewarm_imports, daemon=True).start())
+        
+        # Índice da pasta de músicas atualizado em segundo plano (só pastas alteradas)
+        threading.Thread(target=scan_library, args=(get_download_path(),), daemon=True).start()
+        
+        # Downloads em lote interrompidos (app fechado ou travado no meio)
+        self.after(500, self.check_unfinished_jobs)
+
+    def _pump_ui(self):
+        self.ui.drain()
+        self.after(UI_FRAME_MS, self._pump_ui)
+
+    def post_status(self, label, text, color):
+        """Atualiza um rótulo de status a partir de qualquer thread (só o último vale)"""
+        self.ui.post(lambda: label.configure(text=text, text_color=color), key=("status", str(label)))
 
     def check_system_integrity(self):
         if not os.path.exists(FFMPEG_EXE):
@@ -142,7 +396,17 @@ class MidnightMusicSuite(ctk.CTk):
                       hover_color=THEME["card"], anchor="w", font=FONT_BOLD, height=45,
                       command=lambda: self.show_frame(name)).pack(fill="x", padx=10, pady=5)
 
+    # Método que monta cada aba
+    FRAME_BUILDERS = {
+        "single": "setup_single_frame",
+        "playlist": "setup_playlist_frame",
+        "cover": "setup_cover_frame",
+        "settings": "setup_settings_frame",
+    }
+
     def show_frame(self, name):
+        if name not in self.frames:
+            getattr(self, self.FRAME_BUILDERS[name])()
         for f in self.frames.values(): f.pack_forget()
         self.frames[name].pack(fill="both", expand=True)
         
@@ -153,52 +417,9 @@ class MidnightMusicSuite(ctk.CTk):
     # =========================================================================
     # ⚙️ CONFIGURAÇÃO DE DOWNLOAD (COM PROTEÇÃO ANTI-BOT)
     # =========================================================================
-    def get_opts(self):
-        """Configuração corrigida para evitar bloqueios do YouTube"""
-        # Atualiza o caminho de download da configuração
-        global DOWNLOAD_PATH
-        config = load_config()
-        DOWNLOAD_PATH = config["download_path"]
-        
-        # Configuração para contornar bloqueios do YouTube
-        return {
-            'format': 'bestaudio/best',
-            'ffmpeg_location': FFMPEG_EXE,
-            'paths': {'home': DOWNLOAD_PATH},
-            'outtmpl': '%(artist)s - %(title)s.%(ext)s',
-            'quiet': False,  # Mantém False para ver erros
-            'no_warnings': False,
-            'ignoreerrors': True,
-            'writethumbnail': True,
-            'noplaylist': True,
-            'extract_audio': True,
-            'audio_format': 'mp3',
-            'keepvideo': False,
-            
-            # CONFIGURAÇÕES ANTI-BOT CRÍTICAS
-            'cookiefile': os.path.join(APPLICATION_PATH, 'cookies.txt'),  # Adiciona suporte a cookies
-            'sleep_interval': random.randint(5, 10),  # Pausa aleatória entre downloads
-            'max_sleep_interval': 15,
-            'extractor_args': {
-                'youtube': {
-                    'skip': ['hls', 'dash'],  # Evita formatos problemáticos
-                    'player_client': ['android'],  # Usa cliente Android
-                }
-            },
-            'postprocessors': [
-                {
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
-                },
-                {
-                    'key': 'EmbedThumbnail',
-                },
-                {
-                    'key': 'FFmpegMetadata',
-                },
-            ],
-        }
+    def get_opts(self, recorder=None):
+        """Configuração corrigida para evitar bloqueios do YouTube (banda da classe interativa)"""
+        return build_download_opts(get_download_path(), recorder, priority=PRIORITY_INTERACTIVE)
 
     # =========================================================================
     # 🎵 ABA 1: SINGLE
@@ -216,7 +437,7 @@ class MidnightMusicSuite(ctk.CTk):
         # Mostra o caminho atual de forma compacta
         self.single_path_label = ctk.CTkLabel(
             header_frame, 
-            text=f"Salvando em: {self.get_compact_path(DOWNLOAD_PATH)}",
+            text=f"Salvando em: {self.get_compact_path(get_download_path())}",
             text_color=THEME["gray"],
             font=FONT_SMALL
         )
@@ -236,6 +457,23 @@ class MidnightMusicSuite(ctk.CTk):
         
         info_text = "• Digite o nome da música ou cole um link do YouTube\n• O arquivo será salvo como MP3 com capa embutida\n• Para mudar o local de salvamento, vá em Configurações"
         ctk.CTkLabel(info_frame, text=info_text, text_color=THEME["gray"], justify="left", wraplength=500).pack(padx=15, pady=15)
+        
+        # Várias músicas: buscadas em paralelo e revisadas na lista da aba Multi Playlists
+        ctk.CTkLabel(frame, text="VÁRIAS MÚSICAS", font=FONT_BOLD, text_color=THEME["green"]).pack(pady=(10, 5))
+        ctk.CTkLabel(frame, text="Uma busca \"Artista - Música\" (ou link) por linha, colada ou de um arquivo .txt:",
+                     font=FONT_SMALL, text_color=THEME["gray"]).pack()
+        self.batch_search_txt = ctk.CTkTextbox(frame, width=500, height=120, fg_color=THEME["dark_gray"],
+                                               border_width=0, text_color=THEME["fg"])
+        self.batch_search_txt.pack(pady=10)
+        
+        batch_btns = ctk.CTkFrame(frame, fg_color="transparent")
+        batch_btns.pack(pady=5)
+        ctk.CTkButton(batch_btns, text="ABRIR ARQUIVO", fg_color=THEME["dark_gray"], hover_color=THEME["gray"],
+                      command=self.load_query_file).pack(side="left", padx=5)
+        self.btn_batch_search = ctk.CTkButton(batch_btns, text="BUSCAR E REVISAR", fg_color=THEME["green"],
+                                              text_color=THEME["bg"], hover_color=THEME["green_hover"],
+                                              command=self.start_batch_search)
+        self.btn_batch_search.pack(side="left", padx=5)
 
     def get_compact_path(self, path):
         """Retorna um caminho compactado para exibição"""
@@ -254,31 +492,112 @@ class MidnightMusicSuite(ctk.CTk):
             messagebox.showwarning("Aviso", "Digite o nome da música ou cole um link!")
             return
         
-        # Atualiza o caminho exibido
-        config = load_config()
-        compact_path = self.get_compact_path(config["download_path"])
-        self.single_path_label.configure(text=f"Salvando em: {compact_path}")
-        
         self.btn_dl_single.configure(state="disabled")
-        threading.Thread(target=self._single_thread, args=(q,), daemon=True).start()
+        # Interativo: passa na frente de qualquer lote em andamento
+        SCHEDULER.submit("Música única", lambda job: self._single_thread(q), PRIORITY_INTERACTIVE)
 
     def _single_thread(self, query):
         try:
-            self.single_status.configure(text="Baixando e Convertendo...", text_color=THEME["green"])
-            # Adiciona estratégia anti-bot
-            opts = self.get_opts()
-            opts['sleep_interval'] = 2  # Pausa menor para single
+            owned = find_in_library(query)
+            if owned:
+                self.post_status(self.single_status, f"Já está na biblioteca: {os.path.basename(owned)}", THEME["green"])
+                return
             
-            q = query if query.startswith("http") else f"ytsearch1:{query} audio"
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                ydl.download([q])
-            self.single_status.configure(text="Sucesso! Salvo em MP3.", text_color=THEME["green"])
-            messagebox.showinfo("Sucesso", f"Download MP3 concluído!\n\nSalvo em:\n{DOWNLOAD_PATH}")
+            self.post_status(self.single_status, "Baixando e Convertendo...", THEME["green"])
+            recorder = TrackRecorder(JobStats())
+            opts = self.get_opts(recorder)
+            
+            q = search_query(query)
+            RATE_LIMITER.acquire(PRIORITY_INTERACTIVE)
+            try:
+                with SCHEDULER.slots.slot(PRIORITY_INTERACTIVE), \
+                        DownloaderSession(opts, recorder, LIBRARY,
+                                          AlbumArtCache(CONFIG.get("embed_cover_size", 0))) as session:
+                    record = session.download(q)
+            except Exception as e:
+                RATE_LIMITER.record_failure(e)
+                raise
+            RATE_LIMITER.record_success()
+            label = AUDIO_CODEC_LABELS[audio_codec()]
+            self.post_status(self.single_status, f"Sucesso! Salvo em {label}. ({record['total']:.1f}s)", THEME["green"])
+            path = get_download_path()
+            self.ui.post(lambda: messagebox.showinfo("Sucesso", f"Download {label} concluído!\n\nSalvo em:\n{path}"))
         except Exception as e:
-            self.single_status.configure(text="Erro no Download", text_color=THEME["red"])
+            self.post_status(self.single_status, "Erro no Download", THEME["red"])
             print(f"Erro: {e}")
         finally:
-            self.btn_dl_single.configure(state="normal")
+            self.ui.post(lambda: self.btn_dl_single.configure(state="normal"))
+
+    def load_query_file(self):
+        path = filedialog.askopenfilename(title="Lista de músicas",
+                                          filetypes=[("Texto", "*.txt"), ("Todos os arquivos", "*.*")])
+        if not path:
+            return
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                text = f.read()
+        except OSError as e:
+            messagebox.showerror("Erro", f"Não foi possível ler o arquivo:\n{e}")
+            return
+        self.batch_search_txt.delete("1.0", "end")
+        self.batch_search_txt.insert("1.0", text)
+
+    def start_batch_search(self):
+        queries = [line.strip() for line in self.batch_search_txt.get("1.0", "end").split("\n")
+                   if line.strip() and not line.lstrip().startswith("#")]
+        if not queries:
+            messagebox.showwarning("Aviso", "Digite pelo menos uma busca (uma por linha)!")
+            return
+        if self.playlist_job is not None:
+            # A lista da aba de playlists pertence à análise ou ao download em andamento
+            messagebox.showwarning("Aviso", "Espere a análise ou o download em lote atual terminar para revisar outra lista.")
+            return
+        
+        self.btn_batch_search.configure(state="disabled")
+        self.single_status.configure(text=f"Buscando {len(queries)} músicas...", text_color=THEME["green"])
+        SCHEDULER.submit("Busca em lote", lambda job: self._batch_search_thread(job, queries), PRIORITY_NORMAL)
+
+    def _batch_search_thread(self, job, queries):
+        def on_progress(done, total):
+            self.post_status(self.single_status, f"Buscando... {done}/{total}", THEME["green"])
+
+        try:
+            result = resolve_queries(queries, pacer=RATE_LIMITER, on_progress=on_progress, job=job)
+        except Exception as e:
+            print(f"Erro na busca em lote: {e}")
+            self.post_status(self.single_status, f"Erro na busca: {str(e)[:50]}", THEME["red"])
+            result = None
+        self.ui.post(lambda: self._show_batch_search(result))
+
+    def _show_batch_search(self, result):
+        self.btn_batch_search.configure(state="normal")
+        if result is None:
+            return
+        entries, duplicates, owned, not_found = result
+        summary = f"{len(entries)} músicas encontradas"
+        if owned:
+            summary += f" • {len(owned)} já na biblioteca"
+        if duplicates:
+            summary += f" • {duplicates} buscas repetiam outra música"
+        if not_found:
+            summary += f" • {len(not_found)} sem resultado"
+        self.single_status.configure(text=summary, text_color=THEME["green"] if entries else THEME["red"])
+        if self.playlist_job is not None:
+            # Uma análise ou download começou durante a busca: a lista continua dele
+            return
+        
+        # A revisão e o download em lote ficam com a aba de playlists
+        self.show_frame("playlist")
+        self.list_generation += 1
+        self._populate_list(entries)
+        if entries:
+            self.playlist_status.configure(text=f"{summary}. Revise a lista e baixe as selecionadas.",
+                                           text_color=THEME["green"])
+        if not_found:
+            missing = "\n".join(not_found[:10])
+            if len(not_found) > 10:
+                missing += f"\n... e mais {len(not_found) - 10}"
+            messagebox.showwarning("Buscas sem resultado", f"Nada encontrado para:\n{missing}")
 
     # =========================================================================
     # 📚 ABA 2: MULTI PLAYLISTS - COM SELECÇÃO DE PASTA
@@ -295,7 +614,7 @@ class MidnightMusicSuite(ctk.CTk):
         
         self.playlist_path_label = ctk.CTkLabel(
             header_frame, 
-            text=f"Salvando em: {self.get_compact_path(DOWNLOAD_PATH)}",
+            text=f"Salvando em: {self.get_compact_path(get_download_path())}",
             text_color=THEME["gray"],
             font=FONT_SMALL
         )
@@ -310,7 +629,7 @@ class MidnightMusicSuite(ctk.CTk):
         col1.pack(side="left", padx=20)
         
         ctk.CTkLabel(col1, text="Delay entre músicas:", text_color=THEME["gray"]).pack(anchor="w", pady=2)
-        self.delay_var = ctk.StringVar(value=str(config.get("delay_between_songs", 5)))
+        self.delay_var = ctk.StringVar(value=str(CONFIG.get("delay_between_songs", 5)))
         self.delay_entry = ctk.CTkEntry(col1, width=80, textvariable=self.delay_var)
         self.delay_entry.pack(anchor="w", pady=(0, 10))
         
@@ -319,10 +638,19 @@ class MidnightMusicSuite(ctk.CTk):
         col2.pack(side="left", padx=20)
         
         ctk.CTkLabel(col2, text="Tentativas por música:", text_color=THEME["gray"]).pack(anchor="w", pady=2)
-        self.retry_var = ctk.StringVar(value=str(config.get("retry_attempts", 3)))
+        self.retry_var = ctk.StringVar(value=str(CONFIG.get("retry_attempts", 3)))
         self.retry_entry = ctk.CTkEntry(col2, width=80, textvariable=self.retry_var)
         self.retry_entry.pack(anchor="w", pady=(0, 10))
         
+        # Coluna 3
+        col3 = ctk.CTkFrame(settings_frame, fg_color="transparent")
+        col3.pack(side="left", padx=20)
+        
+        ctk.CTkLabel(col3, text="Downloads simultâneos:", text_color=THEME["gray"]).pack(anchor="w", pady=2)
+        self.workers_var = ctk.StringVar(value=str(CONFIG.get("download_workers", 4)))
+        self.workers_entry = ctk.CTkEntry(col3, width=80, textvariable=self.workers_var)
+        self.workers_entry.pack(anchor="w", pady=(0, 10))
+        
         # Área para links
         links_frame = ctk.CTkFrame(frame, fg_color="transparent")
         links_frame.pack(fill="x", pady=15, padx=20)
@@ -340,6 +668,11 @@ class MidnightMusicSuite(ctk.CTk):
                                          width=150)
         self.btn_analyze.pack(side="left", padx=5)
         
+        self.btn_stream = ctk.CTkButton(buttons_frame, text="ANALISAR E BAIXAR", fg_color=THEME["card"],
+                                        hover_color=THEME["gray"], command=self.analyze_and_download,
+                                        width=150)
+        self.btn_stream.pack(side="left", padx=5)
+        
         self.btn_select_all = ctk.CTkButton(buttons_frame, text="SELECIONAR TODOS", fg_color=THEME["dark_gray"],
                                             hover_color=THEME["gray"], command=self.select_all_items,
                                             width=150, state="disabled")
@@ -354,30 +687,49 @@ class MidnightMusicSuite(ctk.CTk):
         list_frame = ctk.CTkFrame(frame, fg_color="transparent")
         list_frame.pack(fill="both", expand=True, pady=10)
         
-        ctk.CTkLabel(list_frame, text="Músicas encontradas:", text_color=THEME["gray"]).pack(anchor="w", padx=20)
-        self.scroll = ctk.CTkScrollableFrame(list_frame, fg_color=THEME["card"], height=250)
-        self.scroll.pack(fill="both", expand=True, padx=20, pady=5)
+        self.list_label = ctk.CTkLabel(list_frame, text="Músicas encontradas:", text_color=THEME["gray"])
+        self.list_label.pack(anchor="w", padx=20)
+        self.track_list = VirtualTrackList(list_frame, on_change=self._update_list_label, fg_color=THEME["card"], height=250)
+        self.track_list.pack(fill="both", expand=True, padx=20, pady=5)
         
         # Botão de download principal
         self.btn_dl_playlist = ctk.CTkButton(frame, text="BAIXAR LISTA SELECIONADA (MP3)", font=FONT_BOLD, height=45, 
                                              fg_color=THEME["green"], text_color=THEME["bg"], 
                                              hover_color=THEME["green_hover"], state="disabled", 
                                              command=self.start_playlist_download)
-        self.btn_dl_playlist.pack(pady=20)
+        self.btn_dl_playlist.pack(pady=(20, 5))
+        
+        # Controles do job em andamento (os downloads já começados terminam normalmente)
+        job_btns = ctk.CTkFrame(frame, fg_color="transparent")
+        job_btns.pack(pady=(0, 10))
+        self.btn_pause_job = ctk.CTkButton(job_btns, text="PAUSAR", fg_color=THEME["dark_gray"],
+                                           hover_color=THEME["gray"], command=self.toggle_pause_job,
+                                           width=150, state="disabled")
+        self.btn_pause_job.pack(side="left", padx=5)
+        self.btn_cancel_job = ctk.CTkButton(job_btns, text="CANCELAR", fg_color=THEME["dark_gray"],
+                                            hover_color=THEME["red"], command=self.cancel_job,
+                                            width=150, state="disabled")
+        self.btn_cancel_job.pack(side="left", padx=5)
         
-        self.playlist_items = []
         self.playlist_status = ctk.CTkLabel(frame, text="", text_color=THEME["gray"])
         self.playlist_status.pack(pady=(0, 10))
 
     def select_all_items(self):
-        """Seleciona todas as músicas da lista"""
-        for chk, _ in self.playlist_items:
-            chk.select()
+        """Seleciona todas as músicas da lista (ou as do filtro atual)"""
+        self.track_list.select_all()
 
     def deselect_all_items(self):
-        """Deseleciona todas as músicas da lista"""
-        for chk, _ in self.playlist_items:
-            chk.deselect()
+        """Deseleciona todas as músicas da lista (ou as do filtro atual)"""
+        self.track_list.deselect_all()
+
+    def _update_list_label(self, track_list):
+        if not track_list.track_count:
+            self.list_label.configure(text="Músicas encontradas:")
+            return
+        text = f"Músicas encontradas: {track_list.track_count} • {track_list.selected_count()} selecionadas"
+        if track_list.visible_count != track_list.track_count:
+            text += f" • {track_list.visible_count} no filtro"
+        self.list_label.configure(text=text)
 
     def analyze_playlists(self):
         links = [l.strip() for l in self.playlist_txt.get("0.0", "end").split('\n') if l.strip()]
@@ -385,192 +737,350 @@ class MidnightMusicSuite(ctk.CTk):
             messagebox.showwarning("Aviso", "Digite pelo menos um link de playlist!")
             return
         
-        # Atualiza o caminho exibido
-        config = load_config()
-        compact_path = self.get_compact_path(config["download_path"])
-        self.playlist_path_label.configure(text=f"Salvando em: {compact_path}")
-        
         self.btn_analyze.configure(state="disabled")
+        self.btn_stream.configure(state="disabled")
+        self.btn_dl_playlist.configure(state="disabled")
         self.playlist_status.configure(text="Analisando... (Isso pode levar alguns minutos)", text_color=THEME["green"])
-        threading.Thread(target=self._analyze_thread, args=(links,), daemon=True).start()
+        self.list_generation += 1
+        generation = self.list_generation
+        self.playlist_job = SCHEDULER.submit("Análise de playlists",
+                                             lambda job: self._analyze_thread(job, links, generation),
+                                             PRIORITY_NORMAL)
+        self.btn_pause_job.configure(state="normal", text="PAUSAR")
+        self.btn_cancel_job.configure(state="normal")
 
-    def _analyze_thread(self, links):
-        all_entries = []
+    def _analyze_thread(self, job, links, generation):
+        def on_progress(done, total):
+            text = f"Analisando links... {done}/{total} concluídos"
+            if job.paused:
+                text += " • pausado"
+            self.post_status(self.playlist_status, text, THEME["green"])
+
+        listed = threading.Event()
+
+        def on_refresh(entries, duplicates):
+            # A versão revalidada só entra depois da lista inicial
+            listed.wait()
+            self.ui.post(lambda: self._refresh_list(entries, duplicates, generation), key="playlist_refresh")
+
+        all_entries, duplicates = [], 0
         try:
-            # Configuração específica para análise (com delay entre requisições)
-            analyze_opts = {
-                'extract_flat': True, 
-                'quiet': True, 
-                'ignoreerrors': True,
-                'sleep_interval': 3,  # Delay entre vídeos
-                'extractor_args': {
-                    'youtube': {
-                        'skip': ['hls', 'dash'],
-                        'player_client': ['android'],
-                    }
-                }
-            }
-            
-            with yt_dlp.YoutubeDL(analyze_opts) as ydl:
-                for idx, url in enumerate(links):
-                    try:
-                        self.after(0, lambda idx=idx: self.playlist_status.configure(
-                            text=f"Analisando link {idx+1}/{len(links)}...", 
-                            text_color=THEME["green"]
-                        ))
-                        
-                        info = ydl.extract_info(url, download=False)
-                        if 'entries' in info: 
-                            all_entries.extend([e for e in info['entries'] if e])
-                        else: 
-                            all_entries.append(info)
-                        
-                        # Delay aleatório para evitar bloqueios
-                        time.sleep(random.uniform(2, 5))
-                        
-                    except Exception as e:
-                        print(f"Erro ao analisar {url}: {e}")
-                        continue
+            ttl = CONFIG.get("playlist_cache_minutes", 60) * 60
+            all_entries, duplicates = analyze_links(links, on_progress=on_progress, cache=PLAYLIST_CACHE,
+                                                    ttl=ttl, on_refresh=on_refresh, job=job)
+        except JobCancelled:
+            self.ui.post(self._analysis_cancelled)
+            return
         except Exception as e:
             print(f"Erro geral na análise: {e}")
         
-        self.after(0, lambda: self._populate_list(all_entries))
+        self.ui.post(self._job_controls_off)
+        self.ui.post(lambda: self._populate_list(all_entries, duplicates))
+        listed.set()
+
+    def _analysis_cancelled(self):
+        self._job_controls_off()
+        self.btn_analyze.configure(state="normal")
+        self.btn_stream.configure(state="normal")
+        if self.last_entries:
+            # A lista anterior continua lá e pode ser baixada
+            self.btn_dl_playlist.configure(state="normal")
+        self.playlist_status.configure(text="Análise cancelada.", text_color=THEME["gray"])
 
-    def _populate_list(self, entries):
-        for w in self.scroll.winfo_children(): w.destroy()
-        self.playlist_items.clear()
+    def _refresh_list(self, entries, duplicates, generation):
+        """Aplica o resultado da revalidação em segundo plano do cache"""
+        if generation != self.list_generation:
+            # Outra análise, busca em lote ou download já trocou a lista
+            return
+        if self.playlist_downloading:
+            self.playlist_status.configure(
+                text="Playlists atualizadas no cache. Analise de novo depois do download para ver as novas músicas.",
+                text_color=THEME["gray"])
+            return
+        unchecked = self.track_list.unselected_keys()
+        self._populate_list(entries, duplicates)
+        if unchecked:
+            for key in unchecked:
+                index = entries.index(key)
+                if index is not None:
+                    self.track_list.set_selected(index, False)
+            self.track_list.refresh()
+
+    def _populate_list(self, entries, duplicates=0):
+        entries = entries if isinstance(entries, TrackTable) else TrackTable(entries)
         self.btn_analyze.configure(state="normal")
+        self.btn_stream.configure(state="normal")
+        self.last_entries = entries
         
         if entries:
             self.btn_dl_playlist.configure(state="normal")
             self.btn_select_all.configure(state="normal")
             self.btn_deselect_all.configure(state="normal")
-            self.playlist_status.configure(text=f"{len(entries)} músicas encontradas.", text_color=THEME["green"])
+            text = f"{len(entries)} músicas encontradas."
+            if duplicates:
+                text += f" ({duplicates} repetidas entre playlists ignoradas)"
+            self.playlist_status.configure(text=text, text_color=THEME["green"])
         else:
             self.btn_dl_playlist.configure(state="disabled")
             self.btn_select_all.configure(state="disabled")
             self.btn_deselect_all.configure(state="disabled")
             self.playlist_status.configure(text="Nenhuma música encontrada.", text_color=THEME["red"])
-            return
         
-        for entry in entries:
-            url = entry.get('url') or f"https://www.youtube.com/watch?v={entry.get('id')}"
-            title = entry.get('title', 'Música desconhecida')
-            
-            # Frame para cada item
-            item_frame = ctk.CTkFrame(self.scroll, fg_color=THEME["dark_gray"])
-            item_frame.pack(fill="x", pady=2, padx=5)
-            
-            chk = ctk.CTkCheckBox(item_frame, text="", fg_color=THEME["green"], hover_color=THEME["green_hover"], width=20)
-            chk.pack(side="left", padx=5)
-            chk.select()
-            
-            # Limita o tamanho do título para não quebrar o layout
-            display_title = title[:70] + "..." if len(title) > 70 else title
-            ctk.CTkLabel(item_frame, text=display_title, text_color=THEME["fg"], wraplength=450).pack(side="left", padx=10)
-            self.playlist_items.append((chk, url))
+        self.track_list.set_table(entries)
 
-    def start_playlist_download(self):
-        if not os.path.exists(FFMPEG_EXE):
-            messagebox.showerror("Erro", "FFmpeg não encontrado! Não é possível converter para MP3.")
-            return
+    def _append_entries(self, entries):
+        """Músicas que chegaram da análise em streaming (já estão na fila de download)"""
+        start = len(self.last_entries)
+        self.last_entries.extend(entries)
+        self.track_list.tracks_appended(start)
 
-        urls = [url for chk, url in self.playlist_items if chk.get()]
-        if not urls: 
-            messagebox.showwarning("Aviso", "Selecione pelo menos uma música para baixar!")
-            return
-        
-        # Atualiza o caminho exibido
-        config = load_config()
-        compact_path = self.get_compact_path(config["download_path"])
-        self.playlist_path_label.configure(text=f"Salvando em: {compact_path}")
-        
-        # Pega configurações do usuário
+    def _job_settings(self):
+        """Lê (e salva) ritmo, tentativas e downloads simultâneos da aba"""
         try:
             delay = max(2, int(self.delay_var.get()))  # Mínimo 2 segundos
             max_retries = min(5, max(1, int(self.retry_var.get())))  # Entre 1 e 5
+            workers = min(MAX_CONCURRENT_DOWNLOADS, max(1, int(self.workers_var.get())))
         except:
             delay = 5
             max_retries = 3
+            workers = 4
         
         # Salva as configurações
-        config["delay_between_songs"] = delay
-        config["retry_attempts"] = max_retries
-        save_config(config)
+        CONFIG.update(delay_between_songs=delay, retry_attempts=max_retries, download_workers=workers)
+        return delay, max_retries, workers
+
+    def _job_options(self, delay, max_retries, workers):
+        return {
+            'delay': delay, 'max_retries': max_retries, 'workers': workers,
+            'download_path': get_download_path(),
+            'codec': audio_codec(), 'quality': CONFIG.get('audio_quality', '192'),
+        }
+
+    def start_playlist_download(self):
+        if not os.path.exists(FFMPEG_EXE):
+            messagebox.showerror("Erro", "FFmpeg não encontrado! Não é possível converter para MP3.")
+            return
+
+        urls = self.track_list.selected_urls()
+        if not urls: 
+            messagebox.showwarning("Aviso", "Selecione pelo menos uma música para baixar!")
+            return
+        
+        delay, max_retries, workers = self._job_settings()
         
         # Confirmação antes de começar
         confirm = messagebox.askyesno(
             "Confirmar Download",
             f"Você está prestes a baixar {len(urls)} músicas.\n\n"
             f"Configurações:\n"
-            f"• Delay entre músicas: {delay} segundos\n"
+            f"• Ritmo inicial: 1 música a cada {delay}s (ajustado automaticamente)\n"
             f"• Tentativas por música: {max_retries}\n"
-            f"• Local de salvamento: {DOWNLOAD_PATH}\n\n"
+            f"• Downloads simultâneos: {workers}\n"
+            f"• Local de salvamento: {get_download_path()}\n\n"
             f"Deseja continuar?"
         )
         
         if not confirm:
             return
         
+        try:
+            journal = JobJournal.create(urls, self._job_options(delay, max_retries, workers))
+        except OSError as e:
+            messagebox.showerror("Erro", f"Não foi possível criar o diário do download:\n{e}")
+            return
+        
+        self._run_playlist_job(journal)
+
+    def analyze_and_download(self):
+        """Modo streaming: cada playlist resolvida já entra na lista e na fila de download"""
+        links = [l.strip() for l in self.playlist_txt.get("0.0", "end").split('\n') if l.strip()]
+        if not links:
+            messagebox.showwarning("Aviso", "Digite pelo menos um link de playlist!")
+            return
+        if not os.path.exists(FFMPEG_EXE):
+            messagebox.showerror("Erro", "FFmpeg não encontrado! Não é possível converter para MP3.")
+            return
+        
+        delay, max_retries, workers = self._job_settings()
+        try:
+            # Os links ficam no diário: a análise recomeça se o job for retomado
+            journal = JobJournal.create([], dict(self._job_options(delay, max_retries, workers), links=links))
+        except OSError as e:
+            messagebox.showerror("Erro", f"Não foi possível criar o diário do download:\n{e}")
+            return
+        
+        self.list_generation += 1
+        self.last_entries = TrackTable()
+        self.track_list.set_table(self.last_entries)
+        self.playlist_status.configure(text="Analisando e baixando...", text_color=THEME["green"])
+        self._run_playlist_job(journal, links=links)
+
+    def _run_playlist_job(self, journal, indexes=None, links=None):
+        self.btn_analyze.configure(state="disabled")
+        self.btn_stream.configure(state="disabled")
         self.btn_dl_playlist.configure(state="disabled")
         self.btn_select_all.configure(state="disabled")
         self.btn_deselect_all.configure(state="disabled")
-        threading.Thread(target=self._playlist_dl_thread, args=(urls, delay, max_retries), daemon=True).start()
+        self.playlist_downloading = True
+        self.playlist_job = SCHEDULER.submit(
+            "Download em lote", lambda job: self._playlist_dl_thread(job, journal, indexes, links), PRIORITY_BULK)
+        self.btn_pause_job.configure(state="normal", text="PAUSAR")
+        self.btn_cancel_job.configure(state="normal")
 
-    def _playlist_dl_thread(self, urls, delay, max_retries):
-        total = len(urls)
-        success = 0
-        failed = []
-        
-        for i, url in enumerate(urls):
-            try:
-                self.after(0, lambda i=i: self.playlist_status.configure(
-                    text=f"Baixando {i+1}/{total}... Aguarde {delay}s entre músicas", 
-                    text_color=THEME["green"]
-                ))
-                
-                # Configuração específica para este download
-                opts = self.get_opts()
-                opts['sleep_interval'] = delay
-                
-                # Tentativa com retry
-                for attempt in range(max_retries):
-                    try:
-                        with yt_dlp.YoutubeDL(opts) as ydl: 
-                            ydl.download([url])
-                        success += 1
-                        break  # Sucesso, sai do loop de tentativas
-                    except Exception as e:
-                        if attempt < max_retries - 1:
-                            wait_time = delay * (attempt + 1)
-                            self.after(0, lambda attempt=attempt: self.playlist_status.configure(
-                                text=f"Tentativa {attempt+2}/{max_retries} em {wait_time}s...", 
-                                text_color=THEME["gray"]
-                            ))
-                            time.sleep(wait_time)
-                        else:
-                            failed.append(f"Item {i+1}: {str(e)[:100]}")
-                            print(f"Falha após {max_retries} tentativas: {url}")
-                
-                # Delay entre músicas (se não for a última)
-                if i < total - 1:
-                    time.sleep(delay)
-                    
-            except Exception as e:
-                failed.append(f"Item {i+1}: {str(e)[:100]}")
+    def toggle_pause_job(self):
+        job = self.playlist_job
+        if job is None:
+            return
+        if job.paused:
+            job.resume()
+            self.btn_pause_job.configure(text="PAUSAR")
+            self.playlist_status.configure(text="Retomando...", text_color=THEME["green"])
+        else:
+            job.pause()
+            self.btn_pause_job.configure(text="RETOMAR")
+            running = "downloads" if self.playlist_downloading else "links"
+            self.playlist_status.configure(text=f"Pausado (os {running} em andamento terminam normalmente)",
+                                           text_color=THEME["gray"])
+
+    def cancel_job(self):
+        """Cancela o job da aba: o download em lote ou a análise em andamento"""
+        job = self.playlist_job
+        if job is None:
+            return
+        if self.playlist_downloading:
+            if not messagebox.askyesno("Cancelar download",
+                                       "Cancelar o download em lote?\n\n"
+                                       "As músicas já baixadas ficam na pasta e o restante "
+                                       "pode ser retomado depois."):
+                return
+            text = "Cancelando... (esperando os downloads em andamento)"
+        else:
+            text = "Cancelando a análise..."
+        job.cancel()
+        self.btn_pause_job.configure(state="disabled")
+        self.btn_cancel_job.configure(state="disabled")
+        self.playlist_status.configure(text=text, text_color=THEME["gray"])
+
+    def _job_controls_off(self):
+        self.playlist_downloading = False
+        self.playlist_job = None
+        self.btn_pause_job.configure(state="disabled", text="PAUSAR")
+        self.btn_cancel_job.configure(state="disabled")
+
+    def check_unfinished_jobs(self):
+        """Oferece retomar downloads que ficaram pela metade na última execução"""
+        for journal in find_unfinished_jobs():
+            pending = journal.unfinished_indexes()
+            done, failed = journal.counts()
+            created = time.strftime("%d/%m/%Y %H:%M", time.localtime(journal.job['created']))
+            answer = messagebox.askyesnocancel(
+                "Download interrompido",
+                f"O download em lote iniciado em {created} não terminou.\n\n"
+                f"• Concluídas: {done}\n"
+                f"• Com falha: {failed}\n"
+                f"• Restantes: {len(pending)} de {len(journal.urls)}\n"
+                + (f"• Análise incompleta: {len(journal.options['links'])} links serão analisados de novo\n"
+                   if journal.feeding else "") +
+                f"• Local de salvamento: {journal.options['download_path']}\n\n"
+                f"Sim: retomar de onde parou\nNão: descartar\nCancelar: perguntar na próxima vez"
+            )
+            if answer is None:
                 continue
+            if not answer:
+                journal.discard()
+                continue
+            if self.playlist_downloading:
+                messagebox.showwarning("Aviso", "Já existe um download em andamento. O outro job fica para a próxima vez.")
+                return
+            self.show_frame("playlist")
+            self.playlist_status.configure(text=f"Retomando: {len(pending)} músicas restantes...", text_color=THEME["green"])
+            links = journal.options['links'] if journal.feeding else None
+            if links:
+                # A lista volta a ser preenchida conforme os links são analisados de novo
+                self.list_generation += 1
+                self.last_entries = TrackTable()
+                self.track_list.set_table(self.last_entries)
+                self.btn_stream.configure(state="disabled")
+            self._run_playlist_job(journal, pending, links)
+
+    def _playlist_dl_thread(self, job, journal, indexes=None, links=None):
+        max_retries = journal.options['max_retries']
+        stats = JobStats()
+        feed = None
+        if links:
+            feed = stream_feed(links, on_entries=lambda entries: self.ui.post(lambda: self._append_entries(entries)),
+                               job=job)
+
+        def on_progress(event, item, engine):
+            if event == "retry":
+                text = f"Item {item.index+1}: tentativa {item.attempts+1}/{max_retries} em breve..."
+                color = THEME["gray"]
+            else:
+                text = f"Baixando... {engine.done}/{engine.total} concluídas • {engine.active} em andamento"
+                if engine.converting:
+                    text += f" • {engine.converting} convertendo"
+                if engine.skipped:
+                    text += f" • {engine.skipped} já existiam"
+                speed = stats.throughput()
+                if speed:
+                    text += f" • {speed:.2f} MB/s"
+                if job.paused:
+                    text += " • pausado"
+                color = THEME["green"]
+            self.post_status(self.playlist_status, text, color)
+
+        self.post_status(self.playlist_status, "Verificando a biblioteca...", THEME["gray"])
+        try:
+            engine, failed = run_download_job(journal, indexes, stats, on_progress, feed=feed, job=job)
+        except Exception as e:
+            # O diário fica como inacabado: dá para retomar na próxima abertura
+            print(f"Erro no download da playlist: {e}")
+            self.ui.post(self._show_download_buttons)
+            self.post_status(self.playlist_status, f"Erro no download: {str(e)[:50]}", THEME["red"])
+            return
+        if job.cancelled:
+            done, total = engine.done, engine.total
+            self.ui.post(lambda: self._show_download_cancelled(done, total))
+            return
+        if feed is not None and not engine.total:
+            self.ui.post(self._stream_found_nothing)
+            return
         
         # Resultado final
-        self.after(0, lambda: self._show_download_result(total, success, failed))
+        total, success, skipped = engine.total, engine.success, engine.skipped
+        summary = stats.summary_text()
+        self.ui.post(lambda: self._show_download_result(total, success, failed, summary, skipped))
     
-    def _show_download_result(self, total, success, failed):
+    def _stream_found_nothing(self):
+        self._job_controls_off()
+        self.btn_stream.configure(state="normal")
+        self._populate_list([])
+
+    def _show_download_cancelled(self, done, total):
+        self._show_download_buttons()
+        self.playlist_status.configure(text=f"Cancelado: {done}/{total} concluídas. O restante pode ser retomado "
+                                            f"na próxima vez que o app abrir.", text_color=THEME["gray"])
+
+    def _show_download_buttons(self):
+        self._job_controls_off()
+        self.btn_analyze.configure(state="normal")
+        self.btn_stream.configure(state="normal")
         self.btn_dl_playlist.configure(state="normal")
         self.btn_select_all.configure(state="normal")
         self.btn_deselect_all.configure(state="normal")
+
+    def _show_download_result(self, total, success, failed, summary="", skipped=0):
+        self._show_download_buttons()
+        
+        # Tempos por etapa (p50/p95) e MB/s vão junto com o resultado
+        status_extra = f"\n{summary}" if summary else ""
+        if skipped:
+            status_extra = f" ({skipped} já estavam na biblioteca)" + status_extra
+        stats_msg = "\n\nTempos por etapa (p50/p95):\n" + "\n".join(summary.split(" • ")) if summary else ""
         
         if failed:
             result_text = f"Fim! {success}/{total} baixados. {len(failed)} falhas."
-            self.playlist_status.configure(text=result_text, text_color=THEME["red"])
+            self.playlist_status.configure(text=result_text + status_extra, text_color=THEME["red"])
             
             # Mostra erros em uma janela separada se houver muitos
             if len(failed) > 0:
@@ -578,11 +1088,11 @@ class MidnightMusicSuite(ctk.CTk):
                 if len(failed) > 10:
                     error_msg += f"\n... e mais {len(failed) - 10} erros"
                 messagebox.showwarning("Alguns downloads falharam", 
-                                     f"Sucesso: {success}/{total}\n\nErros:\n{error_msg}")
+                                     f"Sucesso: {success}/{total}\n\nErros:\n{error_msg}{stats_msg}")
         else:
-            self.playlist_status.configure(text=f"Sucesso total! {success}/{total} baixados.", 
+            self.playlist_status.configure(text=f"Sucesso total! {success}/{total} baixados.{status_extra}", 
                                       text_color=THEME["green"])
-            messagebox.showinfo("Concluído", f"Todos os MP3s foram salvos em:\n{DOWNLOAD_PATH}")
+            messagebox.showinfo("Concluído", f"Todas as músicas foram salvas em:\n{get_download_path()}{stats_msg}")
 
     # =========================================================================
     # 🖼️ ABA 3: CAPA
@@ -596,6 +1106,30 @@ class MidnightMusicSuite(ctk.CTk):
         ctk.CTkButton(f, text="SALVAR JPG", fg_color=THEME["green"], command=self.save_cover).pack(pady=10)
         self.cover_status = ctk.CTkLabel(f, text="", text_color=THEME["gray"])
         self.cover_status.pack()
+        
+        # Exportação em lote: todas as capas numa pasta, sem um diálogo por imagem
+        ctk.CTkLabel(f, text="EXPORTAR EM LOTE", font=FONT_BOLD, text_color=THEME["green"]).pack(pady=(30, 5))
+        ctk.CTkLabel(f, text="Uma busca por linha (ou use as músicas da última análise de playlists):",
+                     font=FONT_SMALL, text_color=THEME["gray"]).pack()
+        self.cover_batch_txt = ctk.CTkTextbox(f, width=500, height=120, fg_color=THEME["dark_gray"],
+                                              border_width=0, text_color=THEME["fg"])
+        self.cover_batch_txt.pack(pady=10)
+        
+        batch_btns = ctk.CTkFrame(f, fg_color="transparent")
+        batch_btns.pack(pady=5)
+        self.btn_cover_list = ctk.CTkButton(batch_btns, text="EXPORTAR DA LISTA", fg_color=THEME["green"],
+                                            text_color=THEME["bg"], hover_color=THEME["green_hover"],
+                                            command=self.export_covers_from_list)
+        self.btn_cover_list.pack(side="left", padx=5)
+        self.btn_cover_analysis = ctk.CTkButton(batch_btns, text="EXPORTAR DA ÚLTIMA ANÁLISE",
+                                                fg_color=THEME["blue"], hover_color=THEME["blue_hover"],
+                                                command=self.export_covers_from_analysis)
+        self.btn_cover_analysis.pack(side="left", padx=5)
+        self.btn_cover_cancel = ctk.CTkButton(batch_btns, text="CANCELAR", fg_color=THEME["dark_gray"],
+                                              hover_color=THEME["red"], command=self.cancel_cover_export,
+                                              state="disabled")
+        self.btn_cover_cancel.pack(side="left", padx=5)
+        self.cover_export_job = None
 
     def save_cover(self):
         query = self.cover_ent.get()
@@ -603,65 +1137,126 @@ class MidnightMusicSuite(ctk.CTk):
             messagebox.showwarning("Aviso", "Digite algo para buscar!")
             return
         self.cover_status.configure(text="Buscando capa...", text_color=THEME["green"])
-        threading.Thread(target=self._cover_thread, args=(query,), daemon=True).start()
+        SCHEDULER.submit("Capa", lambda job: self._cover_thread(query), PRIORITY_INTERACTIVE)
 
     def _cover_thread(self, q):
         try:
-            opts = {
-                'quiet': True,
-                'extractor_args': {
-                    'youtube': {
-                        'player_client': ['android'],
-                    }
-                }
-            }
+            # Busca e imagem vêm do cache quando já foram vistas antes
+            data, _ = fetch_cover(q, pacer=RATE_LIMITER, priority=PRIORITY_INTERACTIVE)
+            if data is None:
+                self.post_status(self.cover_status, "Nenhuma capa encontrada!", THEME["red"])
+                return
             
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                info = ydl.extract_info(f"ytsearch1:{q}", download=False)['entries'][0]
-                thumbnail_url = info.get('thumbnail', '')
-                
-                if not thumbnail_url:
-                    self.after(0, lambda: self.cover_status.configure(
-                        text="Nenhuma capa encontrada!", 
-                        text_color=THEME["red"]
-                    ))
-                    return
-                
-                resp = requests.get(thumbnail_url, timeout=10)
-                
-                # Converte para JPG
-                img = Image.open(BytesIO(resp.content)).convert("RGB")
-                
-                # Sugere nome baseado na consulta
-                safe_name = "".join(c if c.isalnum() else "_" for c in q)[:50]
-                initial_file = f"{safe_name}_capa.jpg"
-                
-                path = filedialog.asksaveasfilename(
-                    defaultextension=".jpg",
-                    initialfile=initial_file,
-                    filetypes=[("JPEG files", "*.jpg"), ("All files", "*.*")]
-                )
-                
-                if path:
-                    img.save(path, "JPEG", quality=95)
-                    self.after(0, lambda: messagebox.showinfo("Sucesso", f"Capa salva em:\n{path}"))
-                    self.after(0, lambda: self.cover_status.configure(
-                        text="Capa salva com sucesso!", 
-                        text_color=THEME["green"]
-                    ))
-                else:
-                    self.after(0, lambda: self.cover_status.configure(
-                        text="Operação cancelada", 
-                        text_color=THEME["gray"]
-                    ))
+            # Converte para JPG aqui (já reduzida, se configurado); a thread do Tk só grava os bytes
+            jpg = prepare_cover(data, CONFIG.get("export_cover_size", 0))
+            
+            # O diálogo de salvar precisa rodar na thread do Tk
+            self.ui.post(lambda: self._save_cover_image(jpg, q))
                     
         except Exception as e:
             print(f"Erro ao baixar capa: {e}")
-            self.after(0, lambda: self.cover_status.configure(
-                text=f"Erro: {str(e)[:50]}", 
-                text_color=THEME["red"]
-            ))
-            self.after(0, lambda: messagebox.showerror("Erro", f"Não foi possível baixar a capa:\n{str(e)[:100]}"))
+            self.post_status(self.cover_status, f"Erro: {str(e)[:50]}", THEME["red"])
+            self.ui.post(lambda: messagebox.showerror("Erro", f"Não foi possível baixar a capa:\n{str(e)[:100]}"))
+
+    def _save_cover_image(self, jpg, q):
+        # Sugere nome baseado na consulta
+        safe_name = "".join(c if c.isalnum() else "_" for c in q)[:50]
+        initial_file = f"{safe_name}_capa.jpg"
+        
+        path = filedialog.asksaveasfilename(
+            defaultextension=".jpg",
+            initialfile=initial_file,
+            filetypes=[("JPEG files", "*.jpg"), ("All files", "*.*")]
+        )
+        
+        if path:
+            try:
+                with open(path, 'wb') as f:
+                    f.write(jpg)
+            except OSError as e:
+                self.cover_status.configure(text="Erro ao salvar a capa", text_color=THEME["red"])
+                messagebox.showerror("Erro", f"Não foi possível salvar a capa:\n{e}")
+                return
+            self.cover_status.configure(text="Capa salva com sucesso!", text_color=THEME["green"])
+            messagebox.showinfo("Sucesso", f"Capa salva em:\n{path}")
+        else:
+            self.cover_status.configure(text="Operação cancelada", text_color=THEME["gray"])
+
+    def export_covers_from_list(self):
+        queries = [line.strip() for line in self.cover_batch_txt.get("1.0", "end").split("\n") if line.strip()]
+        if not queries:
+            messagebox.showwarning("Aviso", "Digite pelo menos uma busca (uma por linha)!")
+            return
+        self._start_cover_export(cover_items_from_queries(queries))
+
+    def export_covers_from_analysis(self):
+        if not self.last_entries:
+            messagebox.showwarning("Aviso", "Analise alguma playlist na aba Multi Playlists primeiro!")
+            return
+        self._start_cover_export(cover_items_from_entries(self.last_entries))
+
+    def _start_cover_export(self, items):
+        folder = filedialog.askdirectory(title=f"Onde salvar as {len(items)} capas?")
+        if not folder:
+            return
+        self.btn_cover_list.configure(state="disabled")
+        self.btn_cover_analysis.configure(state="disabled")
+        self.btn_cover_cancel.configure(state="normal")
+        self.cover_status.configure(text=f"Buscando {len(items)} capas...", text_color=THEME["green"])
+        self.cover_export_job = SCHEDULER.submit(
+            "Exportação de capas", lambda job: self._cover_export_thread(job, items, folder), PRIORITY_BULK)
+
+    def cancel_cover_export(self):
+        if self.cover_export_job:
+            self.cover_export_job.cancel()
+            self.btn_cover_cancel.configure(state="disabled")
+            self.cover_status.configure(text="Cancelando...", text_color=THEME["gray"])
+
+    def _cover_export_thread(self, job, items, folder):
+        def on_progress(stage, done, total):
+            label = "Buscando" if stage == "fetch" else "Gravando"
+            self.post_status(self.cover_status, f"{label} capas... {done}/{total}", THEME["green"])
+
+        try:
+            written, duplicates, failed = export_covers(items, folder, pacer=RATE_LIMITER, on_progress=on_progress,
+                                                        max_size=CONFIG.get("export_cover_size", 0), job=job)
+        except JobCancelled:
+            self.ui.post(self._cover_export_cancelled)
+            return
+        except Exception as e:
+            print(f"Erro na exportação de capas: {e}")
+            written, duplicates, failed = [], [], [str(e)[:100]]
+        self.ui.post(lambda: self._show_cover_export_result(folder, written, duplicates, failed))
+
+    def _cover_export_buttons(self):
+        self.cover_export_job = None
+        self.btn_cover_list.configure(state="normal")
+        self.btn_cover_analysis.configure(state="normal")
+        self.btn_cover_cancel.configure(state="disabled")
+
+    def _cover_export_cancelled(self):
+        self._cover_export_buttons()
+        self.cover_status.configure(text="Exportação cancelada", text_color=THEME["gray"])
+
+    def _show_cover_export_result(self, folder, written, duplicates, failed):
+        self._cover_export_buttons()
+        text = f"{len(written)} capas salvas"
+        if duplicates:
+            text += f" • {len(duplicates)} repetidas"
+        if failed:
+            text += f" • {len(failed)} falhas"
+        self.cover_status.configure(text=text, text_color=THEME["red"] if failed else THEME["green"])
+        
+        msg = f"{len(written)} capas salvas em:\n{folder}"
+        if duplicates:
+            msg += f"\n\n{len(duplicates)} músicas tinham a mesma imagem de outra e não geraram arquivo novo."
+        if failed:
+            msg += "\n\nFalhas:\n" + "\n".join(failed[:10])
+            if len(failed) > 10:
+                msg += f"\n... e mais {len(failed) - 10}"
+            messagebox.showwarning("Exportação concluída com falhas", msg)
+        else:
+            messagebox.showinfo("Exportação concluída", msg)
 
     # =========================================================================
     # ⚙️ ABA 4: CONFIGURAÇÕES (NOVA ABA)
@@ -690,7 +1285,7 @@ class MidnightMusicSuite(ctk.CTk):
         
         self.current_path_label = ctk.CTkLabel(
             path_frame, 
-            text=DOWNLOAD_PATH,
+            text=get_download_path(),
             text_color=THEME["gray"],
             wraplength=400
         )
@@ -717,7 +1312,7 @@ class MidnightMusicSuite(ctk.CTk):
         delay_frame.pack(fill="x", pady=5)
         
         ctk.CTkLabel(delay_frame, text="Delay entre músicas (segundos):", text_color=THEME["gray"], width=200).pack(side="left")
-        self.settings_delay_var = ctk.StringVar(value=str(config.get("delay_between_songs", 5)))
+        self.settings_delay_var = ctk.StringVar(value=str(CONFIG.get("delay_between_songs", 5)))
         self.settings_delay_entry = ctk.CTkEntry(delay_frame, width=80, textvariable=self.settings_delay_var)
         self.settings_delay_entry.pack(side="right")
         
@@ -726,10 +1321,81 @@ class MidnightMusicSuite(ctk.CTk):
         retry_frame.pack(fill="x", pady=5)
         
         ctk.CTkLabel(retry_frame, text="Tentativas por música:", text_color=THEME["gray"], width=200).pack(side="left")
-        self.settings_retry_var = ctk.StringVar(value=str(config.get("retry_attempts", 3)))
+        self.settings_retry_var = ctk.StringVar(value=str(CONFIG.get("retry_attempts", 3)))
         self.settings_retry_entry = ctk.CTkEntry(retry_frame, width=80, textvariable=self.settings_retry_var)
         self.settings_retry_entry.pack(side="right")
         
+        # Downloads simultâneos
+        workers_frame = ctk.CTkFrame(section2, fg_color="transparent")
+        workers_frame.pack(fill="x", pady=5)
+        
+        ctk.CTkLabel(workers_frame, text="Downloads simultâneos:", text_color=THEME["gray"], width=200).pack(side="left")
+        self.settings_workers_var = ctk.StringVar(value=str(CONFIG.get("download_workers", 4)))
+        self.settings_workers_entry = ctk.CTkEntry(workers_frame, width=80, textvariable=self.settings_workers_var)
+        self.settings_workers_entry.pack(side="right")
+        
+        # Validade do cache de análises
+        cache_frame = ctk.CTkFrame(section2, fg_color="transparent")
+        cache_frame.pack(fill="x", pady=5)
+        
+        ctk.CTkLabel(cache_frame, text="Cache de playlists (minutos):", text_color=THEME["gray"], width=200).pack(side="left")
+        self.settings_cache_var = ctk.StringVar(value=str(CONFIG.get("playlist_cache_minutes", 60)))
+        self.settings_cache_entry = ctk.CTkEntry(cache_frame, width=80, textvariable=self.settings_cache_var)
+        self.settings_cache_entry.pack(side="right")
+        
+        # Tamanho da capa embutida nas músicas
+        embed_frame = ctk.CTkFrame(section2, fg_color="transparent")
+        embed_frame.pack(fill="x", pady=5)
+        
+        ctk.CTkLabel(embed_frame, text="Capa embutida (px, 0 = original):", text_color=THEME["gray"], width=200).pack(side="left")
+        self.settings_embed_var = ctk.StringVar(value=str(CONFIG.get("embed_cover_size", 500)))
+        self.settings_embed_entry = ctk.CTkEntry(embed_frame, width=80, textvariable=self.settings_embed_var)
+        self.settings_embed_entry.pack(side="right")
+        
+        # Tamanho das capas exportadas
+        export_frame = ctk.CTkFrame(section2, fg_color="transparent")
+        export_frame.pack(fill="x", pady=5)
+        
+        ctk.CTkLabel(export_frame, text="Capa exportada (px, 0 = original):", text_color=THEME["gray"], width=200).pack(side="left")
+        self.settings_export_var = ctk.StringVar(value=str(CONFIG.get("export_cover_size", 0)))
+        self.settings_export_entry = ctk.CTkEntry(export_frame, width=80, textvariable=self.settings_export_var)
+        self.settings_export_entry.pack(side="right")
+        
+        # Formato de saída (best = o da fonte, sem conversão)
+        codec_frame = ctk.CTkFrame(section2, fg_color="transparent")
+        codec_frame.pack(fill="x", pady=5)
+        
+        ctk.CTkLabel(codec_frame, text="Formato (best = sem conversão):", text_color=THEME["gray"], width=200).pack(side="left")
+        self.settings_codec_var = ctk.StringVar(value=audio_codec())
+        ctk.CTkOptionMenu(codec_frame, width=80, values=list(AUDIO_CODECS), variable=self.settings_codec_var,
+                          fg_color=THEME["dark_gray"], button_color=THEME["dark_gray"]).pack(side="right")
+        
+        # Qualidade da conversão
+        quality_frame = ctk.CTkFrame(section2, fg_color="transparent")
+        quality_frame.pack(fill="x", pady=5)
+        
+        ctk.CTkLabel(quality_frame, text="Qualidade (kbps ou 0-10 VBR):", text_color=THEME["gray"], width=200).pack(side="left")
+        self.settings_quality_var = ctk.StringVar(value=str(CONFIG.get("audio_quality", "192")))
+        self.settings_quality_entry = ctk.CTkEntry(quality_frame, width=80, textvariable=self.settings_quality_var)
+        self.settings_quality_entry.pack(side="right")
+        
+        # Banda: vale na hora, também para os downloads em andamento
+        bw_bulk_frame = ctk.CTkFrame(section2, fg_color="transparent")
+        bw_bulk_frame.pack(fill="x", pady=5)
+        
+        ctk.CTkLabel(bw_bulk_frame, text="Banda em lote (KB/s, 0 = livre):", text_color=THEME["gray"], width=200).pack(side="left")
+        self.settings_bw_bulk_var = ctk.StringVar(value=str(CONFIG.get("bandwidth_bulk_kbps", 0)))
+        self.settings_bw_bulk_entry = ctk.CTkEntry(bw_bulk_frame, width=80, textvariable=self.settings_bw_bulk_var)
+        self.settings_bw_bulk_entry.pack(side="right")
+        
+        bw_single_frame = ctk.CTkFrame(section2, fg_color="transparent")
+        bw_single_frame.pack(fill="x", pady=5)
+        
+        ctk.CTkLabel(bw_single_frame, text="Banda música única (KB/s, 0 = livre):", text_color=THEME["gray"], width=200).pack(side="left")
+        self.settings_bw_single_var = ctk.StringVar(value=str(CONFIG.get("bandwidth_interactive_kbps", 0)))
+        self.settings_bw_single_entry = ctk.CTkEntry(bw_single_frame, width=80, textvariable=self.settings_bw_single_var)
+        self.settings_bw_single_entry.pack(side="right")
+        
         # Botões de ação
         buttons_frame = ctk.CTkFrame(settings_card, fg_color="transparent")
         buttons_frame.pack(pady=20)
@@ -765,44 +1431,62 @@ class MidnightMusicSuite(ctk.CTk):
 
     def update_current_path_display(self):
         """Atualiza a exibição do caminho atual na aba de configurações"""
-        config = load_config()
-        self.current_path_label.configure(text=config["download_path"])
+        download_path = get_download_path()
+        if hasattr(self, 'current_path_label'):
+            self.current_path_label.configure(text=download_path)
         
         # Atualiza também as outras abas
-        compact_path = self.get_compact_path(config["download_path"])
+        compact_path = self.get_compact_path(download_path)
         if hasattr(self, 'single_path_label'):
             self.single_path_label.configure(text=f"Salvando em: {compact_path}")
         if hasattr(self, 'playlist_path_label'):
             self.playlist_path_label.configure(text=f"Salvando em: {compact_path}")
 
+    def _on_config_changed(self, old, new):
+        """Chamado pelo CONFIG (de qualquer thread) quando a configuração muda"""
+        self.ui.post(lambda: self._apply_config(new), key="config")
+
+    def _apply_config(self, new):
+        self.update_current_path_display()
+        # Abas ainda não montadas leem a configuração quando forem criadas
+        for key, names in (
+            ("delay_between_songs", ("delay_var", "settings_delay_var")),
+            ("retry_attempts", ("retry_var", "settings_retry_var")),
+            ("download_workers", ("workers_var", "settings_workers_var")),
+            ("playlist_cache_minutes", ("settings_cache_var",)),
+            ("embed_cover_size", ("settings_embed_var",)),
+            ("export_cover_size", ("settings_export_var",)),
+            ("audio_codec", ("settings_codec_var",)),
+            ("audio_quality", ("settings_quality_var",)),
+            ("bandwidth_bulk_kbps", ("settings_bw_bulk_var",)),
+            ("bandwidth_interactive_kbps", ("settings_bw_single_var",)),
+        ):
+            for name in names:
+                if hasattr(self, name):
+                    getattr(self, name).set(str(new[key]))
+
     def change_download_path(self):
-        global DOWNLOAD_PATH
         """Abre uma caixa de diálogo para selecionar nova pasta de downloads"""
         new_path = filedialog.askdirectory(
             title="Selecione onde salvar as músicas",
-            initialdir=DOWNLOAD_PATH
+            initialdir=get_download_path()
         )
         
         if new_path:
-            # Salva a nova configuração
-            config["download_path"] = new_path
-            save_config(config)
-            
-            # Atualiza a variável global
-            DOWNLOAD_PATH = new_path
-            
             # Cria a pasta se não existir
-            if not os.path.exists(DOWNLOAD_PATH):
+            if not os.path.exists(new_path):
                 try:
-                    os.makedirs(DOWNLOAD_PATH)
+                    os.makedirs(new_path)
                 except:
-                    messagebox.showerror("Erro", f"Não foi possível criar a pasta:\n{DOWNLOAD_PATH}")
+                    messagebox.showerror("Erro", f"Não foi possível criar a pasta:\n{new_path}")
                     return
             
-            # Atualiza a exibição
-            self.update_current_path_display()
+            # Salva a nova configuração (os rótulos se atualizam pela notificação)
+            if not CONFIG.update(download_path=new_path):
+                messagebox.showerror("Erro", "Não foi possível salvar a configuração!")
+                return
             
-            messagebox.showinfo("Sucesso", f"Local de salvamento alterado para:\n{DOWNLOAD_PATH}")
+            messagebox.showinfo("Sucesso", f"Local de salvamento alterado para:\n{new_path}")
 
     def save_settings(self):
         """Salva as configurações da aba de configurações"""
@@ -810,14 +1494,23 @@ class MidnightMusicSuite(ctk.CTk):
             # Valida e salva as configurações
             delay = max(2, int(self.settings_delay_var.get()))
             retry = min(5, max(1, int(self.settings_retry_var.get())))
+            workers = min(MAX_CONCURRENT_DOWNLOADS, max(1, int(self.settings_workers_var.get())))
+            cache_minutes = max(0, int(self.settings_cache_var.get()))
+            embed_size = max(0, int(self.settings_embed_var.get()))
+            export_size = max(0, int(self.settings_export_var.get()))
+            codec = self.settings_codec_var.get()
+            quality = self.settings_quality_var.get().strip().lower().rstrip("k")
+            if not quality.isdigit():
+                raise ValueError(quality)
+            bw_bulk = max(0, int(self.settings_bw_bulk_var.get()))
+            bw_single = max(0, int(self.settings_bw_single_var.get()))
             
-            config["delay_between_songs"] = delay
-            config["retry_attempts"] = retry
-            save_config(config)
-            
-            # Atualiza também os valores nas outras abas
-            self.delay_var.set(str(delay))
-            self.retry_var.set(str(retry))
+            if not CONFIG.update(delay_between_songs=delay, retry_attempts=retry, download_workers=workers,
+                                 playlist_cache_minutes=cache_minutes, embed_cover_size=embed_size,
+                                 export_cover_size=export_size, audio_codec=codec, audio_quality=quality,
+                                 bandwidth_bulk_kbps=bw_bulk, bandwidth_interactive_kbps=bw_single):
+                messagebox.showerror("Erro", "Não foi possível salvar a configuração!")
+                return
             
             messagebox.showinfo("Sucesso", "Configurações salvas com sucesso!")
             
@@ -825,7 +1518,6 @@ class MidnightMusicSuite(ctk.CTk):
             messagebox.showerror("Erro", "Por favor, insira valores numéricos válidos!")
 
     def restore_defaults(self):
-        global DOWNLOAD_PATH
         """Restaura as configurações padrão"""
         confirm = messagebox.askyesno(
             "Restaurar Padrões",
@@ -833,34 +1525,20 @@ class MidnightMusicSuite(ctk.CTk):
         )
         
         if confirm:
-            default_config = {
-                "download_path": DEFAULT_DOWNLOAD_PATH,
-                "delay_between_songs": 5,
-                "retry_attempts": 3
-            }
-            
-            save_config(default_config)
-            
-            # Atualiza a interface
-            DOWNLOAD_PATH = DEFAULT_DOWNLOAD_PATH
+            save_config(DEFAULT_CONFIG)
             
             # Cria a pasta padrão se não existir
-            if not os.path.exists(DOWNLOAD_PATH):
+            if not os.path.exists(DEFAULT_DOWNLOAD_PATH):
                 try:
-                    os.makedirs(DOWNLOAD_PATH)
+                    os.makedirs(DEFAULT_DOWNLOAD_PATH)
                 except:
                     pass
             
-            # Atualiza todos os campos
-            self.settings_delay_var.set("5")
-            self.settings_retry_var.set("3")
-            self.delay_var.set("5")
-            self.retry_var.set("3")
-            
-            self.update_current_path_display()
-            
+            # Os campos e rótulos se atualizam pela notificação do CONFIG
             messagebox.showinfo("Sucesso", "Configurações restauradas para os valores padrão!")
 
 if __name__ == "__main__":
+    # Necessário para o pool de processos das capas no executável do Windows
+    multiprocessing.freeze_support()
     app = MidnightMusicSuite()
     app.mainloop()
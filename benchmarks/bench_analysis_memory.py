@@ -0,0 +1,155 @@
+"""Pico de memória do resultado de uma análise: dicts x TrackTable.
+
+Gera uma playlist sintética com entradas no formato das extrações planas do
+yt-dlp e mede, com o tracemalloc, o pico e o que fica retido em três casos:
+os dicts inteiros do yt-dlp, os dicts compactos (só os campos usados) e a
+TrackTable. Os dois primeiros também pagam as listas de títulos e URLs que a
+lista da interface montava.
+
+Esses três casos geram as entradas uma por vez. O caminho real recebe do
+yt-dlp a lista inteira de uma vez, então ele é medido à parte: o resultado
+do extract_info (com a lista pronta) passa pelo extract_link, que compacta
+e solta cada dict, e vira TrackTable, como faz o analyze_links. Para
+comparar, mede também a versão antiga, que compactava com a lista do yt-dlp
+ainda viva. Não faz nenhuma requisição de rede.
+
+    python benchmarks/bench_analysis_memory.py --entries 50000
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import midnight_core as mm  # noqa: E402
+
+ID_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+
+
+def video_id(n):
+    chars = []
+    for _ in range(11):
+        n, r = divmod(n, len(ID_CHARS))
+        chars.append(ID_CHARS[r])
+    return "".join(chars)
+
+
+def raw_entries(count, channels=400):
+    """Entradas como as do extract_flat do YouTube (uma por vez)"""
+    for n in range(count):
+        vid = video_id(n * 7919 + 13)
+        channel = n % channels
+        yield {
+            '_type': 'url', 'ie_key': 'Youtube', 'id': vid,
+            'url': f"https://www.youtube.com/watch?v={vid}",
+            'title': f"Artista {channel} - Música número {n} (Official Audio)",
+            'description': None, 'duration': 150.0 + n % 240,
+            'channel_id': f"UC{video_id(channel)}{video_id(channel + 1)[:11]}",
+            'channel': f"Artista {channel}", 'channel_url': f"https://www.youtube.com/channel/UC{video_id(channel)}",
+            'uploader': f"Artista {channel}", 'uploader_id': f"@artista{channel}",
+            'uploader_url': f"https://www.youtube.com/@artista{channel}",
+            'thumbnails': [{'url': f"https://i.ytimg.com/vi/{vid}/hqdefault.jpg?sqp=-oaymwE{size}",
+                            'height': size, 'width': size * 16 // 9} for size in (94, 110, 138, 188)],
+            'timestamp': None, 'release_timestamp': None, 'availability': None,
+            'view_count': 1000 + n, 'live_status': None, 'channel_is_verified': None,
+            '__x_forwarded_for_ip': None,
+        }
+
+
+def build_raw(count):
+    entries = list(raw_entries(count))
+    titles = [e.get('title') or 'Música desconhecida' for e in entries]
+    urls = [mm.entry_url(e) for e in entries]
+    return entries, titles, urls, [t.lower() for t in titles]
+
+
+def build_compact(count):
+    entries = [mm.compact_entry(e) for e in raw_entries(count)]
+    titles = [e.get('title') or 'Música desconhecida' for e in entries]
+    urls = [mm.entry_url(e) for e in entries]
+    return entries, titles, urls, [t.lower() for t in titles]
+
+
+def build_table(count):
+    return mm.TrackTable(mm.compact_entry(e) for e in raw_entries(count))
+
+
+class PlaylistYdl:
+    """Faz o papel do YoutubeDL: extract_info devolve a playlist já montada"""
+
+    def __init__(self, count):
+        self.count = count
+        self.params = {}
+
+    def extract_info(self, url, download=False):
+        return {'_type': 'playlist', 'id': 'PLbench', 'entries': list(raw_entries(self.count))}
+
+
+class NoPacer:
+    def acquire(self, priority=None):
+        pass
+
+    def record_success(self):
+        pass
+
+    def record_failure(self, error):
+        pass
+
+
+def build_extracted(count):
+    entries = mm.extract_link(PlaylistYdl(count), "bench", NoPacer())
+    return mm.TrackTable(entries)
+
+
+def build_extracted_before(count):
+    info = PlaylistYdl(count).extract_info("bench")
+    raw = [e for e in info['entries'] if e]
+    return mm.TrackTable([mm.compact_entry(e) for e in raw])
+
+
+def measure(build, count):
+    gc.collect()
+    tracemalloc.start()
+    result = build(count)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return retained, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=50000)
+    args = parser.parse_args()
+
+    table = build_table(1000)
+    assert len(table) == 1000 and table.index(table.ids[500]) == 500
+
+    print(f"{args.entries} entradas")
+    print(f"{'formato':<26} {'retido MB':>10} {'pico MB':>9}")
+    results = {}
+    for label, build in (("dicts do yt-dlp + lista", build_raw),
+                         ("dicts compactos + lista", build_compact),
+                         ("TrackTable", build_table)):
+        retained, peak = measure(build, args.entries)
+        results[label] = peak
+        print(f"{label:<26} {retained / 1e6:>10.1f} {peak / 1e6:>9.1f}")
+    before, after = results["dicts compactos + lista"], results["TrackTable"]
+    print(f"\nTrackTable usa {after / before:.0%} do pico dos dicts compactos")
+
+    print("\ncaminho real (lista inteira do yt-dlp -> extract_link -> TrackTable)")
+    print(f"{'versão':<26} {'retido MB':>10} {'pico MB':>9}")
+    for label, build in (("compacta com a lista viva", build_extracted_before),
+                         ("extract_link atual", build_extracted)):
+        retained, peak = measure(build, args.entries)
+        results[label] = peak
+        print(f"{label:<26} {retained / 1e6:>10.1f} {peak / 1e6:>9.1f}")
+    before, after = results["compacta com a lista viva"], results["extract_link atual"]
+    print(f"\nextract_link atual usa {after / before:.0%} do pico da versão antiga")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""Overhead por item: YoutubeDL novo a cada URL x uma sessão por worker.
+
+Mede só o custo local que se repete por item (ler o midnight_config.json,
+montar as opções, inicializar o YoutubeDL, carregar e salvar o cookies.txt).
+Não faz nenhuma requisição de rede.
+
+    python benchmarks/bench_session.py --items 200 --cookies 300
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp  # noqa: E402
+import midnight_core as mm  # noqa: E402
+
+
+def write_cookie_file(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# Netscape HTTP Cookie File\n")
+        for i in range(count):
+            f.write(f".youtube.com\tTRUE\t/\tTRUE\t2147483647\tCOOKIE_{i}\t{'x' * 64}\n")
+
+
+def per_url(items, cookiefile):
+    """Comportamento antigo: lê a config e cria um YoutubeDL para cada item"""
+    for _ in range(items):
+        config = mm.load_config()
+        opts = mm.build_download_opts(config["download_path"])
+        opts["cookiefile"] = cookiefile
+        opts["quiet"] = opts["no_warnings"] = True
+        ydl = yt_dlp.YoutubeDL(opts)
+        ydl.cookiejar  # a primeira requisição carrega os cookies
+        ydl.close()
+
+
+def per_session(items, cookiefile):
+    """Comportamento novo: uma sessão por worker reaproveitada em todos os itens"""
+    opts = mm.build_download_opts(mm.load_config()["download_path"])
+    opts["cookiefile"] = cookiefile
+    opts["quiet"] = True
+    session = mm.DownloaderSession(opts)
+    session.log.warning = lambda msg: None
+    for _ in range(items):
+        if session._ydl is None:
+            session._ydl = yt_dlp.YoutubeDL(session.opts)
+            session._ydl.cookiejar
+        session.log.errors.clear()
+    session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--cookies", type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cookiefile = os.path.join(tmp, "cookies.txt")
+        write_cookie_file(cookiefile, args.cookies)
+
+        for name, fn in (("YoutubeDL por URL", per_url), ("sessão por worker", per_session)):
+            start = time.perf_counter()
+            fn(args.items, cookiefile)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<20} {elapsed:8.3f}s total  {elapsed / args.items * 1000:8.2f} ms/item")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Tempo até a primeira pintura da janela principal (partida a frio).
+
+Cada rodada é um processo Python novo que importa o MidnightMusic, cria a
+janela e processa os eventos pendentes até ela estar desenhada. Mostra a
+mediana e o pior caso de cada fase e avisa se o yt-dlp ou o requests foram
+carregados antes da janela aparecer. Precisa de um display (no Linux sem
+monitor, use xvfb-run).
+
+    python benchmarks/bench_startup.py --runs 5 --max-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Não podem estar carregados na primeira pintura
+DEFERRED_MODULES = ("yt_dlp", "requests")
+
+
+def child():
+    """Uma partida: mede e imprime uma linha JSON"""
+    start = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    import MidnightMusic as mm
+    imported = time.perf_counter()
+
+    # Diálogos modais travariam a medição
+    for name in ("showerror", "showwarning", "showinfo", "askyesno", "askyesnocancel"):
+        setattr(mm.messagebox, name, lambda *args, **kwargs: None)
+
+    app = mm.MidnightMusicSuite()
+    built = time.perf_counter()
+    app.update_idletasks()
+    app.update()
+    painted = time.perf_counter()
+    early = [name for name in DEFERRED_MODULES if name in sys.modules]
+    app.destroy()
+    print(json.dumps({
+        'import': imported - start,
+        'window': built - imported,
+        'first_paint': painted - start,
+        'early_modules': early,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, help="falha (código 1) se a mediana passar disso")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return 0
+
+    runs = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"],
+                             capture_output=True, text=True)
+        wall = time.perf_counter() - start
+        if out.returncode != 0:
+            print(out.stderr.strip(), file=sys.stderr)
+            return 2
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        result['process'] = wall
+        runs.append(result)
+
+    for key, label in (("import", "import do módulo"), ("window", "montar a janela"),
+                       ("first_paint", "primeira pintura"), ("process", "processo inteiro")):
+        values = [r[key] * 1000 for r in runs]
+        print(f"{label:<18} mediana {statistics.median(values):8.1f} ms   pior {max(values):8.1f} ms")
+
+    early = sorted({name for r in runs for name in r['early_modules']})
+    if early:
+        print(f"AVISO: carregados antes da primeira pintura: {', '.join(early)}")
+    median_ms = statistics.median(r['first_paint'] for r in runs) * 1000
+    if early or (args.max_ms is not None and median_ms > args.max_ms):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
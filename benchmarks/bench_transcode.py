@@ -0,0 +1,101 @@
+"""Segundos de CPU por música em cada modo de saída (recodificar x só remuxar).
+
+Gera fontes sintéticas iguais às que o YouTube entrega (Opus em WebM e AAC
+em M4A) e roda o mesmo FFmpegExtractAudio do yt-dlp que o app usa, com cada
+codec de saída. Não faz nenhuma requisição de rede; precisa do FFmpeg.
+
+    python benchmarks/bench_transcode.py --tracks 5 --seconds 180
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp  # noqa: E402
+from yt_dlp.postprocessor import FFmpegExtractAudioPP  # noqa: E402
+import midnight_core as mm  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows: sem CPU dos processos filhos, só o tempo de relógio
+    resource = None
+
+# Fontes que o YouTube costuma oferecer
+SOURCES = {
+    'opus': ('webm', ['-c:a', 'libopus', '-b:a', '128k']),
+    'aac': ('m4a', ['-c:a', 'aac', '-b:a', '128k']),
+}
+
+# Fonte que o formato de cada modo escolhe (o "bestaudio" do YouTube é Opus)
+PICKED_SOURCE = {'mp3': 'opus', 'm4a': 'aac', 'opus': 'opus', 'best': 'opus'}
+
+
+def make_source(ffmpeg, folder, codec, seconds):
+    ext, args = SOURCES[codec]
+    path = os.path.join(folder, f"source_{codec}.{ext}")
+    subprocess.run([ffmpeg, '-v', 'error', '-y', '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+                    '-f', 'lavfi', '-i', f'anoisesrc=duration={seconds}:amplitude=0.05',
+                    '-filter_complex', 'amix=inputs=2', *args, path], check=True)
+    return path, ext
+
+
+def children_cpu():
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_mode(ydl, source, ext, codec, quality, tracks, folder):
+    """Converte `tracks` cópias da fonte. Retorna (cpu s/música, relógio s/música, tamanho de saída)"""
+    cpu = wall = 0.0
+    size = 0
+    for i in range(tracks):
+        path = os.path.join(folder, f"track_{codec}_{i}.{ext}")
+        shutil.copyfile(source, path)
+        pp = FFmpegExtractAudioPP(ydl, preferredcodec=codec, preferredquality=quality)
+        cpu_start, wall_start = children_cpu(), time.perf_counter()
+        _, info = pp.run({'filepath': path, 'ext': ext})
+        cpu += children_cpu() - cpu_start
+        wall += time.perf_counter() - wall_start
+        size = os.path.getsize(info['filepath'])
+        os.remove(info['filepath'])
+        if os.path.exists(path):
+            os.remove(path)
+    return cpu / tracks, wall / tracks, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=3)
+    parser.add_argument("--seconds", type=int, default=180, help="duração de cada música sintética")
+    parser.add_argument("--quality", default="192")
+    parser.add_argument("--ffmpeg", default=shutil.which("ffmpeg") or mm.FFMPEG_EXE)
+    args = parser.parse_args()
+    if not args.ffmpeg or not os.path.exists(args.ffmpeg):
+        print("FFmpeg não encontrado (use --ffmpeg)", file=sys.stderr)
+        return 2
+
+    ydl = yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True, 'ffmpeg_location': args.ffmpeg})
+    unit = "CPU s" if resource else "relógio s"
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = {codec: make_source(args.ffmpeg, tmp, codec, args.seconds) for codec in SOURCES}
+        print(f"{'modo':<6} {'fonte':<6} {'ação':<12} {unit + '/música':>14} {'relógio s/música':>17} {'saída KB':>9}")
+        for codec in mm.AUDIO_CODECS:
+            for source_codec, (source, ext) in sources.items():
+                cpu, wall, size = run_mode(ydl, source, ext, codec, args.quality, args.tracks, tmp)
+                copy = codec == 'best' or codec == source_codec or (codec == 'm4a' and source_codec == 'aac')
+                picked = " *" if PICKED_SOURCE[codec] == source_codec else ""
+                print(f"{codec:<6} {source_codec:<6} {('remux' if copy else 'recodificar') + picked:<12} "
+                      f"{(cpu if resource else wall):>14.3f} {wall:>17.3f} {size / 1024:>9.0f}")
+    print("\n* fonte que o formato do modo escolhe no YouTube; mp3 recodifica sempre, m4a/opus/best só remuxam")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,335 @@
+"""Midnight Music sem interface gráfica (servidor, cron, scripts).
+
+    python midnight_cli.py single "Artista - Música"
+    python midnight_cli.py playlist links.txt --workers 4
+    python midnight_cli.py search musicas.txt
+    python midnight_cli.py analyze https://www.youtube.com/playlist?list=...
+    python midnight_cli.py resume
+
+Usa as mesmas opções do yt-dlp, o mesmo ritmo, as mesmas tentativas, o mesmo
+diário de jobs e a mesma biblioteca da interface, mas não importa Tk. Pillow
+e requests só são carregados quando uma capa vai ser embutida; sem eles, as
+músicas saem sem capa (com um aviso). Com --json, cada evento vira uma linha
+JSON no stdout; o resto (saída do yt-dlp, avisos) vai para o stderr.
+
+Códigos de saída: 0 tudo certo, 1 algum item falhou, 2 erro de uso, de
+ambiente ou inesperado (FFmpeg ausente, arquivo inexistente, nada para
+retomar, banco corrompido), 130 interrompido (Ctrl+C; o job pode ser
+retomado com "resume").
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+
+import midnight_core as core
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+
+class Reporter:
+    """Escreve os eventos como texto legível ou como uma linha JSON cada"""
+
+    def __init__(self, stream, as_json=False):
+        self.stream = stream
+        self.as_json = as_json
+
+    def emit(self, event, text=None, **fields):
+        if self.as_json:
+            line = json.dumps(dict(event=event, ts=round(time.time(), 3), **fields), ensure_ascii=False)
+        else:
+            line = text
+        if line:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def read_links(path):
+    """Um link por linha; linhas vazias e comentários (#) são ignorados"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+def setup_ffmpeg(path=None):
+    """Usa o FFmpeg indicado, o ffmpeg.exe ao lado do programa ou o do PATH"""
+    candidate = path or (core.FFMPEG_EXE if os.path.exists(core.FFMPEG_EXE) else shutil.which('ffmpeg'))
+    if not candidate or not os.path.exists(candidate):
+        return False
+    core.FFMPEG_EXE = candidate
+    return True
+
+
+def job_options(args):
+    config = core.CONFIG.snapshot()
+    return {
+        'delay': max(2, args.delay if args.delay is not None else config['delay_between_songs']),
+        'max_retries': min(5, max(1, args.retries if args.retries is not None else config['retry_attempts'])),
+        'workers': min(core.MAX_CONCURRENT_DOWNLOADS,
+                       max(1, args.workers if args.workers is not None else config['download_workers'])),
+        'download_path': os.path.abspath(args.output or config['download_path']),
+        'codec': args.codec or core.audio_codec(),
+        'quality': args.quality or config['audio_quality'],
+    }
+
+
+def analyze(links, reporter, use_cache=True):
+    def on_progress(done, total):
+        reporter.emit("analyze_progress", f"Analisando... {done}/{total} links", done=done, total=total)
+
+    ttl = core.CONFIG.get('playlist_cache_minutes', 60) * 60
+    entries, duplicates = core.analyze_links(
+        links, pacer=core.RATE_LIMITER, on_progress=on_progress,
+        cache=core.PLAYLIST_CACHE if use_cache else None, ttl=ttl)
+    return entries, duplicates
+
+
+def run_job(journal, indexes, reporter, feed=None, max_kbps=None):
+    stats = core.JobStats()
+    if max_kbps is not None:
+        limits = core.bandwidth_limits()
+        limits['bulk'] = max(0, max_kbps) * 1024
+        core.BANDWIDTH.set_limits(**limits)
+    total = len(indexes) if indexes is not None else len(journal.urls)
+    # Sem feed, um diário de streaming retomado ganha o dos links guardados nele
+    streaming = feed is not None or journal.feeding
+    reporter.emit("job", f"Job {journal.job['id']}: {'streaming' if streaming else f'{total} músicas'} "
+                  f"em {journal.options['download_path']}",
+                  job=journal.job['id'], journal=journal.path, total=total, options=journal.options,
+                  streaming=streaming)
+
+    def on_progress(event, item, engine):
+        error = str(item.error)[:300] if item.error and event in ("retry", "failed") else None
+        text = f"[{engine.done}/{engine.total}] {event}: {item.url}" + (f" ({error})" if error else "")
+        reporter.emit(event, text, index=item.index, url=item.url, attempt=item.attempts, error=error,
+                      done=engine.done, total=engine.total, active=engine.active, converting=engine.converting)
+
+    engine, failed = core.run_download_job(journal, indexes, stats, on_progress, feed=feed)
+    reporter.emit("summary",
+                  f"Fim: {engine.success}/{engine.total} concluídas ({engine.skipped} já existiam), "
+                  f"{len(failed)} falhas. {stats.summary_text()}",
+                  total=engine.total, success=engine.success, skipped=engine.skipped,
+                  failed=failed, stages=stats.summary(), mb_per_s=stats.throughput())
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+def cmd_single(args, reporter):
+    owned = core.find_in_library(args.query)
+    if owned:
+        reporter.emit("skipped", f"Já está na biblioteca: {owned}", query=args.query, path=owned)
+        return EXIT_OK
+
+    download_path = os.path.abspath(args.output or core.get_download_path())
+    os.makedirs(download_path, exist_ok=True)
+    recorder = core.TrackRecorder(core.JobStats())
+    album_art = core.AlbumArtCache(core.CONFIG.get('embed_cover_size', 0))
+    reporter.emit("start", f"Baixando: {args.query}", query=args.query)
+    core.RATE_LIMITER.acquire(core.PRIORITY_INTERACTIVE)
+    opts = core.build_download_opts(download_path, recorder, args.codec, args.quality,
+                                    priority=core.PRIORITY_INTERACTIVE)
+    try:
+        with core.SCHEDULER.slots.slot(core.PRIORITY_INTERACTIVE), \
+                core.DownloaderSession(opts, recorder, core.LIBRARY, album_art) as session:
+            record = session.download(core.search_query(args.query))
+    except Exception as e:
+        core.RATE_LIMITER.record_failure(e)
+        reporter.emit("failed", f"Falhou: {e}", query=args.query, error=str(e)[:300])
+        return EXIT_FAILED
+    core.RATE_LIMITER.record_success()
+    reporter.emit("done", f"Concluído em {record['total']:.1f}s: {download_path}",
+                  query=args.query, record=record)
+    return EXIT_OK
+
+
+def cmd_analyze(args, reporter):
+    links = list(args.links)
+    if args.file:
+        links += read_links(args.file)
+    if not links:
+        reporter.emit("error", "Nenhum link para analisar", error="no links")
+        return EXIT_USAGE
+    entries, duplicates = analyze(links, reporter, use_cache=not args.no_cache)
+    emit_entries(entries, reporter)
+    reporter.emit("summary", f"{len(entries)} músicas ({duplicates} duplicadas removidas)",
+                  entries=len(entries), duplicates=duplicates)
+    return EXIT_OK
+
+
+def emit_entries(entries, reporter):
+    for entry in entries:
+        reporter.emit("entry", f"{entry.get('title') or '?'}\t{core.entry_url(entry)}",
+                      id=entry.get('id'), url=core.entry_url(entry), title=entry.get('title'),
+                      duration=entry.get('duration'), uploader=entry.get('uploader'))
+
+
+def cmd_search(args, reporter):
+    queries = read_links(args.file)
+    if not queries:
+        reporter.emit("error", f"Nenhuma busca em {args.file}", error="no queries")
+        return EXIT_USAGE
+
+    def on_progress(done, total):
+        reporter.emit("search_progress", f"Buscando... {done}/{total}", done=done, total=total)
+
+    entries, duplicates, owned, not_found = core.resolve_queries(
+        queries, pacer=core.RATE_LIMITER, on_progress=on_progress,
+        cache=None if args.no_cache else core.SEARCH_CACHE)
+    for query in not_found:
+        reporter.emit("not_found", f"Sem resultado: {query}", query=query)
+    reporter.emit("analyzed", f"{len(entries)} músicas encontradas ({len(owned)} já na biblioteca, "
+                  f"{len(not_found)} sem resultado, {duplicates} repetidas)",
+                  entries=len(entries), owned=len(owned), not_found=len(not_found), duplicates=duplicates)
+    if args.dry_run:
+        emit_entries(entries, reporter)
+        return EXIT_OK
+    urls = entries.urls()
+    if not urls:
+        return EXIT_OK
+    options = job_options(args)
+    os.makedirs(options['download_path'], exist_ok=True)
+    journal = core.JobJournal.create(urls, options)
+    return run_job(journal, None, reporter, max_kbps=args.max_kbps)
+
+
+def cmd_playlist(args, reporter):
+    links = read_links(args.file)
+    if not links:
+        reporter.emit("error", f"Nenhum link em {args.file}", error="no links")
+        return EXIT_USAGE
+    if args.stream:
+        return stream_playlist(links, args, reporter)
+    entries, duplicates = analyze(links, reporter, use_cache=not args.no_cache)
+    urls = entries.urls()
+    reporter.emit("analyzed", f"{len(urls)} músicas encontradas ({duplicates} duplicadas removidas)",
+                  entries=len(urls), duplicates=duplicates)
+    if not urls:
+        return EXIT_OK
+    options = job_options(args)
+    os.makedirs(options['download_path'], exist_ok=True)
+    journal = core.JobJournal.create(urls, options)
+    return run_job(journal, None, reporter, max_kbps=args.max_kbps)
+
+
+def stream_playlist(links, args, reporter):
+    """Baixa cada música assim que o link dela é resolvido, sem esperar a análise inteira"""
+    options = job_options(args)
+    os.makedirs(options['download_path'], exist_ok=True)
+    # Os links ficam no diário: "resume" analisa de novo o que não terminou
+    journal = core.JobJournal.create([], dict(options, links=links))
+
+    def on_entries(entries):
+        reporter.emit("analyzed", f"+{len(entries)} músicas na fila", entries=len(entries))
+
+    feed = core.stream_feed(links, on_entries, pacer=core.RATE_LIMITER,
+                            cache=None if args.no_cache else core.PLAYLIST_CACHE)
+    return run_job(journal, None, reporter, feed, args.max_kbps)
+
+
+def cmd_resume(args, reporter):
+    if args.list:
+        for job in core.find_unfinished_jobs():
+            done, failed = job.counts()
+            reporter.emit("unfinished", f"{job.path}: {done} concluídas, {failed} falhas, "
+                          f"{len(job.unfinished_indexes())} restantes" + (", análise incompleta" if job.feeding else ""),
+                          journal=job.path, job=job.job['id'], done=done, failed=failed,
+                          pending=len(job.unfinished_indexes()), total=len(job.urls), feeding=job.feeding)
+        return EXIT_OK
+    if args.journal:
+        journal = core.JobJournal.load(args.journal)
+    else:
+        jobs = core.find_unfinished_jobs()
+        journal = jobs[0] if jobs else None
+    pending = journal.unfinished_indexes() if journal else []
+    # Um job em streaming interrompido na análise volta a analisar os links guardados
+    if not pending and not (journal and journal.feeding):
+        reporter.emit("error", "Nenhum download interrompido para retomar", error="nothing to resume")
+        return EXIT_USAGE
+    return run_job(journal, pending, reporter)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="midnight_cli", description="Midnight Music sem interface gráfica")
+    parser.add_argument("--json", action="store_true", help="uma linha JSON por evento no stdout")
+    parser.add_argument("--ffmpeg", help="caminho do executável do FFmpeg")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def audio_args(p):
+        p.add_argument("--codec", choices=sorted(core.AUDIO_CODECS),
+                       help="formato de saída (best = o da fonte, sem conversão)")
+        p.add_argument("--quality", help="qualidade em kbps (ou 0-10 para VBR)")
+
+    def job_args(p):
+        p.add_argument("-o", "--output", help="pasta de destino (padrão: a da configuração)")
+        audio_args(p)
+        p.add_argument("--workers", type=int, help="downloads simultâneos")
+        p.add_argument("--retries", type=int, help="tentativas por música")
+        p.add_argument("--delay", type=int, help="ritmo inicial em segundos por requisição")
+        p.add_argument("--max-kbps", type=int, help="banda total dos downloads em KB/s (padrão: a da configuração)")
+
+    p = sub.add_parser("single", help="baixa uma música (busca ou link)")
+    p.add_argument("query")
+    p.add_argument("-o", "--output", help="pasta de destino (padrão: a da configuração)")
+    audio_args(p)
+    p.set_defaults(func=cmd_single, needs_ffmpeg=True)
+
+    p = sub.add_parser("playlist", help="analisa os links de um arquivo e baixa tudo")
+    p.add_argument("file", help="arquivo com um link de playlist ou música por linha")
+    p.add_argument("--no-cache", action="store_true", help="ignora o cache de análises")
+    p.add_argument("--stream", action="store_true", help="começa a baixar enquanto os links ainda são analisados")
+    job_args(p)
+    p.set_defaults(func=cmd_playlist, needs_ffmpeg=True)
+
+    p = sub.add_parser("search", help="busca cada linha de um arquivo (\"Artista - Música\") e baixa tudo")
+    p.add_argument("file", help="arquivo com uma busca ou link por linha")
+    p.add_argument("--no-cache", action="store_true", help="ignora o cache de buscas")
+    p.add_argument("--dry-run", action="store_true", help="só lista o que cada busca encontrou, sem baixar")
+    job_args(p)
+    p.set_defaults(func=cmd_search, needs_ffmpeg=True)
+
+    p = sub.add_parser("analyze", help="só lista as músicas dos links, sem baixar")
+    p.add_argument("links", nargs="*")
+    p.add_argument("-f", "--file", help="arquivo com um link por linha")
+    p.add_argument("--no-cache", action="store_true", help="ignora o cache de análises")
+    p.set_defaults(func=cmd_analyze, needs_ffmpeg=False)
+
+    p = sub.add_parser("resume", help="retoma um download em lote interrompido")
+    p.add_argument("journal", nargs="?", help="diário do job (padrão: o mais recente)")
+    p.add_argument("--list", action="store_true", help="só lista os jobs interrompidos")
+    p.set_defaults(func=cmd_resume, needs_ffmpeg=True)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # Eventos no stdout; prints do yt-dlp e do núcleo vão para o stderr
+    reporter = Reporter(sys.stdout, args.json)
+    sys.stdout = sys.stderr
+    try:
+        if args.needs_ffmpeg and not (getattr(args, 'list', False) or getattr(args, 'dry_run', False)) and not setup_ffmpeg(args.ffmpeg):
+            reporter.emit("error", "FFmpeg não encontrado (use --ffmpeg ou coloque-o no PATH)",
+                          error="ffmpeg not found")
+            return EXIT_USAGE
+        return args.func(args, reporter)
+    except OSError as e:
+        reporter.emit("error", f"Erro: {e}", error=str(e))
+        return EXIT_USAGE
+    except KeyboardInterrupt:
+        reporter.emit("interrupted", "Interrompido; use \"resume\" para continuar", error="interrupted")
+        return EXIT_INTERRUPTED
+    except Exception as e:
+        # SQLite, yt-dlp, JSON...: a mensagem vai para o stderr e, com --json, vira evento
+        print(f"Erro: {type(e).__name__}: {e}")
+        reporter.emit("error", None, error=str(e), type=type(e).__name__)
+        return EXIT_USAGE
+    finally:
+        sys.stdout = reporter.stream
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,3232 @@
+"""Núcleo do Midnight Music: configuração, sessão do yt-dlp, motor de downloads,
+diário de jobs, biblioteca, ritmo, métricas e análise de playlists.
+
+Não importa nenhum toolkit gráfico e só carrega o yt-dlp quando um download ou
+uma análise começa; é usado pela interface (MidnightMusic.py) e pela linha de
+comando (midnight_cli.py).
+"""
+import os
+import sys
+import threading
+import time
+import json
+import tempfile
+import hashlib
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from collections import OrderedDict
+from contextlib import contextmanager
+import heapq
+import queue
+import itertools
+import math
+import re
+import sqlite3
+import unicodedata
+import importlib.util
+from array import array
+from io import BytesIO
+
+# ⚙️ CONFIGURAÇÕES DE DIRETÓRIO E FFMPEG
+# =============================================================================
+
+# Caminho padrão inicial
+DEFAULT_DOWNLOAD_PATH = r"D:\Músicas\Spotify"
+
+# Caminho para o arquivo de configuração
+if getattr(sys, 'frozen', False):
+    APPLICATION_PATH = os.path.dirname(sys.executable)
+else:
+    APPLICATION_PATH = os.path.dirname(os.path.abspath(__file__))
+
+CONFIG_FILE = os.path.join(APPLICATION_PATH, "midnight_config.json")
+
+def write_json_atomic(path, data, indent=None):
+    """Grava em um temporário na mesma pasta e troca pelo destino com rename atômico"""
+    folder = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix="." + os.path.basename(path) + ".", suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=indent, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+# Valores padrão (também usados por "Restaurar padrões")
+DEFAULT_CONFIG = {
+    "download_path": DEFAULT_DOWNLOAD_PATH,
+    "delay_between_songs": 5,
+    "retry_attempts": 3,
+    "download_workers": 4,
+    "playlist_cache_minutes": 60,
+    "embed_cover_size": 500,
+    "export_cover_size": 0,
+    "audio_codec": "mp3",
+    "audio_quality": "192",
+    "bandwidth_interactive_kbps": 0,
+    "bandwidth_bulk_kbps": 0
+}
+
+
+class ConfigStore:
+    """Configuração em memória, segura entre threads.
+
+    Só relê o JSON quando o mtime do arquivo muda. Salva em um arquivo
+    temporário e troca pelo original com rename atômico, então nenhum leitor
+    vê um arquivo pela metade. Quem se inscreve com subscribe() é avisado
+    a cada mudança com (antiga, nova).
+    """
+
+    def __init__(self, path, defaults):
+        self.path = path
+        self.defaults = dict(defaults)
+        self._lock = threading.RLock()
+        self._data = None
+        self._mtime = None
+        self._listeners = []
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _refresh(self):
+        """Recarrega se o arquivo mudou. Retorna (antiga, nova) ou None"""
+        mtime = self._file_mtime()
+        if self._data is not None and mtime == self._mtime:
+            return None
+
+        data = dict(self.defaults)
+        if mtime is not None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Erro ao ler configuração: {e}")
+                if self._data is not None:
+                    # Fica com a última versão boa e só tenta de novo quando o arquivo mudar
+                    self._mtime = mtime
+                    return None
+
+        old, self._data, self._mtime = self._data, data, mtime
+        if old is None or old == data:
+            return None
+        return old, dict(data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            change = self._refresh()
+            value = self._data.get(key, default)
+        self._notify(change)
+        return value
+
+    def snapshot(self):
+        """Cópia da configuração atual"""
+        with self._lock:
+            change = self._refresh()
+            data = dict(self._data)
+        self._notify(change)
+        return data
+
+    def update(self, **changes):
+        """Altera algumas chaves e salva. Retorna False se não conseguiu gravar"""
+        with self._lock:
+            self._refresh()
+            data = dict(self._data)
+            data.update(changes)
+            return self._commit(data)
+
+    def replace(self, config):
+        """Substitui a configuração inteira e salva"""
+        with self._lock:
+            self._refresh()
+            data = dict(self.defaults)
+            data.update(config)
+            return self._commit(data)
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._listeners.append(callback)
+
+    def _commit(self, data):
+        old = self._data
+        if not self._write(data):
+            return False
+        self._data = data
+        self._mtime = self._file_mtime()
+        if old != data:
+            self._notify((old, dict(data)))
+        return True
+
+    def _write(self, data):
+        try:
+            write_json_atomic(self.path, data, indent=4)
+            return True
+        except OSError as e:
+            print(f"Erro ao salvar configuração: {e}")
+            return False
+
+    def _notify(self, change):
+        if not change:
+            return
+        for callback in list(self._listeners):
+            try:
+                callback(*change)
+            except Exception as e:
+                print(f"Erro ao notificar mudança de configuração: {e}")
+
+
+CONFIG = ConfigStore(CONFIG_FILE, DEFAULT_CONFIG)
+
+
+# Carrega configuração salva ou usa padrão
+def load_config():
+    return CONFIG.snapshot()
+
+def save_config(config):
+    return CONFIG.replace(config)
+
+def get_download_path():
+    return CONFIG.get("download_path")
+
+# Caminho exato para o executável
+FFMPEG_EXE = os.path.join(APPLICATION_PATH, "ffmpeg.exe")
+FFPROBE_EXE = os.path.join(APPLICATION_PATH, "ffprobe.exe")
+
+def ensure_download_path():
+    """Cria a pasta de músicas se não existir"""
+    if not os.path.exists(get_download_path()):
+        try: 
+            os.makedirs(get_download_path())
+        except: 
+            # Se não conseguir criar, volta para a pasta do programa
+            CONFIG.update(download_path=APPLICATION_PATH)
+
+# =============================================================================
+# 🎧 OPÇÕES DO YT-DLP E SESSÃO DE DOWNLOAD
+# =============================================================================
+
+# Formato pedido para cada codec de saída. A fonte no mesmo codec vem
+# primeiro: assim o FFmpegExtractAudio só copia o áudio para o novo
+# contêiner (remux) em vez de decodificar e codificar de novo
+AUDIO_CODECS = {
+    'mp3': 'bestaudio[acodec=mp3]/bestaudio/best',
+    'm4a': 'bestaudio[ext=m4a]/bestaudio[acodec^=mp4a]/bestaudio/best',
+    'opus': 'bestaudio[acodec=opus]/bestaudio/best',
+    'best': 'bestaudio/best',  # Mantém o codec da fonte, nunca recodifica
+}
+
+# Nome de cada codec nas mensagens
+AUDIO_CODEC_LABELS = {'mp3': 'MP3', 'm4a': 'M4A', 'opus': 'Opus', 'best': 'formato original'}
+
+
+def audio_codec():
+    codec = CONFIG.get('audio_codec', 'mp3')
+    return codec if codec in AUDIO_CODECS else 'mp3'
+
+
+def in_process_tags():
+    """Com o mutagen, tags e capa são gravadas pelo TagWriter, sem passadas do FFmpeg"""
+    return importlib.util.find_spec('mutagen') is not None
+
+
+def can_embed_art(codec):
+    """MP3 recebe capa pelo FFmpeg; M4A/Opus/Ogg precisam do mutagen"""
+    return codec == 'mp3' or in_process_tags()
+
+
+# Subpasta do destino onde os downloads esperam a conversão (pipeline)
+STAGING_DIR_NAME = ".midnight-staging"
+
+
+def build_download_opts(download_path, recorder=None, codec=None, quality=None, staging=False, priority=None):
+    """Configuração corrigida para evitar bloqueios do YouTube.
+
+    Com um TrackRecorder, os hooks do yt-dlp medem cada etapa da música.
+    `codec` e `quality` (kbps, ou 0-10 para VBR) vêm da configuração se
+    não forem informados. Com `staging`, os arquivos ficam em
+    STAGING_DIR_NAME até o pós-processamento movê-los para o destino.
+    Os bytes baixados passam pelo BANDWIDTH na classe de `priority`
+    (lote, se não for informada).
+    """
+    codec = codec if codec in AUDIO_CODECS else audio_codec()
+    quality = str(quality or CONFIG.get('audio_quality', '192'))
+    postprocessors = [
+        {
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': codec,
+            'preferredquality': quality,
+        },
+    ]
+    tags = in_process_tags()
+    if not tags:
+        # Sem o mutagen: uma passada do FFmpeg para a capa e outra para as tags
+        if can_embed_art(codec):
+            postprocessors.append({
+                'key': 'EmbedThumbnail',
+            })
+        postprocessors.append({
+            'key': 'FFmpegMetadata',
+        })
+    # Configuração para contornar bloqueios do YouTube
+    opts = {
+        'format': AUDIO_CODECS[codec],
+        'ffmpeg_location': FFMPEG_EXE,
+        'paths': {'home': download_path},
+        'outtmpl': '%(artist)s - %(title)s.%(ext)s',
+        'quiet': False,  # Mantém False para ver erros
+        'no_warnings': False,
+        'ignoreerrors': True,
+        'writethumbnail': can_embed_art(codec) and not tags,
+        'noplaylist': True,
+        'extract_audio': True,
+        'audio_format': codec,
+        'keepvideo': False,
+        'progress_hooks': [bandwidth_hook(priority)],
+        
+        # CONFIGURAÇÕES ANTI-BOT CRÍTICAS
+        'cookiefile': os.path.join(APPLICATION_PATH, 'cookies.txt'),  # Adiciona suporte a cookies
+        # O ritmo entre downloads fica a cargo do RATE_LIMITER (sem pausas fixas)
+        'extractor_args': {
+            'youtube': {
+                'skip': ['hls', 'dash'],  # Evita formatos problemáticos
+                'player_client': ['android'],  # Usa cliente Android
+            }
+        },
+        'postprocessors': postprocessors,
+    }
+    if staging:
+        opts['paths']['temp'] = os.path.join(download_path, STAGING_DIR_NAME)
+    priority = PRIORITY_BULK if priority is None else priority
+    if priority != PRIORITY_INTERACTIVE or BANDWIDTH.limited(priority):
+        # Blocos fixos: o limite de banda age a cada 64 KB. As sessões de
+        # lote vivem o job inteiro e o limite pode ser ligado no meio dele,
+        # então ficam sempre assim; a música única, que dura um download,
+        # só quando a classe dela já tem limite
+        opts['buffersize'] = BANDWIDTH_BLOCK_SIZE
+        opts['noresizebuffer'] = True
+    if recorder is not None:
+        opts['progress_hooks'].append(recorder.progress_hook)
+        opts['postprocessor_hooks'] = [recorder.postprocessor_hook]
+    return opts
+
+
+class YdlLogger:
+    """Logger do yt-dlp que mantém a saída no console e guarda os erros do item atual"""
+
+    def __init__(self, quiet=False):
+        self.quiet = quiet
+        self.errors = []
+
+    def debug(self, msg):
+        if not self.quiet and not msg.startswith('[debug] '):
+            print(msg)
+
+    def info(self, msg):
+        if not self.quiet:
+            print(msg)
+
+    def warning(self, msg):
+        print(f"WARNING: {msg}")
+
+    def error(self, msg):
+        print(msg)
+        self.errors.append(msg)
+
+
+def _staging_ydl(opts):
+    """YoutubeDL que para depois do download: o pós-processamento de cada
+    formato fica em `staged` para ser feito por outra thread"""
+    import yt_dlp
+
+    class StagingYoutubeDL(yt_dlp.YoutubeDL):
+        def post_process(self, filename, info, files_to_move=None):
+            info['filepath'] = filename
+            # Cópia: ao voltar, o yt-dlp tira deste dict os campos iguais aos do vídeo (título, artista...)
+            self.staged.append(dict(info, __files_to_move=files_to_move or {}))
+            return info
+
+    ydl = StagingYoutubeDL(opts)
+    ydl.staged = []
+    return ydl
+
+
+def register_download(library, video_id, path):
+    try:
+        library.add_track(video_id, path)
+    except sqlite3.Error as e:
+        print(f"Erro ao registrar na biblioteca: {e}")
+
+
+class StagedDownload:
+    """Música já baixada na pasta de preparo, esperando o pós-processamento"""
+    __slots__ = ("url", "infos", "track", "staged_at")
+
+    def __init__(self, url, infos, track):
+        self.url = url
+        self.infos = infos
+        self.track = track
+        self.staged_at = time.monotonic()
+
+
+# Os workers de um job terminam juntos e cada YoutubeDL grava o cookies.txt
+# ao fechar: as gravações são feitas uma de cada vez
+_cookie_lock = threading.Lock()
+
+
+class DownloaderSession:
+    """Um YoutubeDL de vida longa, reaproveitado entre itens de um job.
+
+    Mantém conexões HTTP, cookies e extratores já inicializados. O YoutubeDL
+    não é thread-safe, então cada worker deve ter a sua própria sessão.
+    Com `deferred`, `download` só baixa e retorna um StagedDownload; a
+    conversão, a capa, as tags e a mudança de pasta ficam para o
+    TranscodePool. Com o mutagen, as tags e a capa vão para o TAG_WRITER.
+    """
+
+    def __init__(self, opts, recorder=None, library=None, album_art=None, deferred=False):
+        self.opts = dict(opts)
+        self.log = YdlLogger()
+        self.opts['logger'] = self.log
+        self.recorder = recorder
+        self.library = library
+        self.album_art = album_art
+        self.tag_writer = TAG_WRITER if in_process_tags() else None
+        if self.tag_writer is None and not self.opts.get('writethumbnail'):
+            # Sem capa embutida (contêiner sem suporte): nada para preparar
+            self.album_art = None
+        elif album_art is not None:
+            # A capa vem do AlbumArtCache do job, não de um download por música
+            self.opts['writethumbnail'] = False
+        self.deferred = deferred
+        self._tags = []  # gravações de tags pedidas pelo download atual
+        self._ydl = None
+
+    def download(self, url):
+        if self._ydl is None:
+            if self.deferred:
+                self._ydl = _staging_ydl(self.opts)
+            else:
+                import yt_dlp
+                self._ydl = yt_dlp.YoutubeDL(self.opts)
+            if self.album_art is not None:
+                stage = make_album_art_stage(self._ydl, self.album_art, in_memory=self.tag_writer is not None)
+                self._ydl.add_post_processor(stage, when='before_dl')
+            if self.tag_writer is not None and not self.deferred:
+                self._ydl.add_post_processor(make_tag_stage(self._ydl, self.tag_writer, self._tags),
+                                             when='after_move')
+        self.log.errors.clear()
+        del self._tags[:]
+        if self.recorder:
+            self.recorder.begin(url)
+        try:
+            info = self._ydl.extract_info(url)
+            if self.log.errors:
+                raise DownloadFailed(self.log.errors[-1])
+            # Só conta como sucesso depois que as tags estiverem no arquivo
+            error = tags_error(self._tags)
+            if error is not None:
+                raise error
+            if self.deferred and self._ydl.staged:
+                staged, self._ydl.staged = self._ydl.staged, []
+                return StagedDownload(url, staged, self.recorder.detach() if self.recorder else None)
+            if self.library and info:
+                self._add_to_library(info)
+        except DownloadFailed as e:
+            self._record(False, e)
+            raise
+        except Exception as e:
+            self._record(False, e)
+            # Estado desconhecido: recria o YoutubeDL no próximo item
+            self.close()
+            raise
+        finally:
+            if self.deferred and self._ydl is not None:
+                self._ydl.staged.clear()
+        return self._record(True)
+
+    def _add_to_library(self, info):
+        # Buscas (ytsearch) chegam como playlist com a música em `entries`
+        for entry in info.get('entries') or [info]:
+            downloads = (entry or {}).get('requested_downloads') or []
+            if downloads and downloads[-1].get('filepath'):
+                register_download(self.library, entry['id'], downloads[-1]['filepath'])
+
+    def _record(self, ok, error=None):
+        if self.recorder:
+            return self.recorder.end(ok, error)
+        return None
+
+    def close(self):
+        if self._ydl is not None:
+            try:
+                # close() regrava o cookies.txt (sem escrita atômica): uma sessão por vez
+                with _cookie_lock:
+                    self._ydl.close()
+            except Exception as e:
+                print(f"Erro ao fechar sessão do yt-dlp: {e}")
+            self._ydl = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# =============================================================================
+# 🗂️ AGENDADOR DE JOBS (PRIORIDADES, ORÇAMENTO GLOBAL, PAUSAR/CANCELAR)
+# =============================================================================
+
+# Prioridades (o menor número passa na frente): pedidos de quem está olhando
+# para a tela, análises e, por último, os trabalhos em lote
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+
+# Jobs não interativos rodando ao mesmo tempo; os demais esperam na fila
+MAX_RUNNING_JOBS = 2
+
+# Limite global de downloads/buscas simultâneos (vale para todas as abas)
+MAX_CONCURRENT_DOWNLOADS = 8
+# Dessas vagas, quantas só os pedidos interativos podem ocupar
+INTERACTIVE_RESERVED_SLOTS = 1
+
+
+class JobCancelled(Exception):
+    """O job foi cancelado (lançada no próximo checkpoint dele)"""
+
+
+class Job:
+    """Um trabalho do agendador, com pausa, retomada e cancelamento.
+
+    Tudo é cooperativo: o código do job chama `checkpoint()` entre um item
+    e outro, e é ali que ele espera enquanto estiver pausado ou recebe
+    JobCancelled. O que já estava em andamento termina normalmente.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, name, priority=PRIORITY_BULK):
+        self.id = next(Job._ids)
+        self.name = name
+        self.priority = priority
+        self.result = None
+        self.error = None
+        self._lock = threading.Lock()
+        self._resumed = threading.Event()
+        self._resumed.set()
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+        self._on_cancel = []
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._resumed.is_set()
+
+    def pause(self):
+        if not self._done.is_set() and not self.cancelled:
+            self._resumed.clear()
+
+    def resume(self):
+        self._resumed.set()
+
+    def cancel(self):
+        with self._lock:
+            if self._done.is_set() or self._cancelled.is_set():
+                return
+            self._cancelled.set()
+            callbacks, self._on_cancel = self._on_cancel, []
+        # Quem estava pausado acorda para ver o cancelamento
+        self._resumed.set()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Erro ao cancelar o job {self.name}: {e}")
+
+    def on_cancel(self, callback):
+        """Chama callback() quando o job for cancelado (na hora, se já foi)"""
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._on_cancel.append(callback)
+                return
+        callback()
+
+    def checkpoint(self):
+        """Espera enquanto o job estiver pausado; lança JobCancelled se foi cancelado"""
+        self._resumed.wait()
+        if self._cancelled.is_set():
+            raise JobCancelled(self.name)
+
+    def wait(self, timeout=None):
+        """Bloqueia até o job terminar. Retorna se terminou dentro do tempo"""
+        return self._done.wait(timeout)
+
+
+class PrioritySlots:
+    """Orçamento global de operações de rede simultâneas, em ordem de prioridade.
+
+    Quem pede uma vaga entra numa fila ordenada por (prioridade, chegada):
+    um download interativo passa na frente de todos os itens em lote que
+    estão esperando. As `reserved` vagas ficam só para os interativos, então
+    uma música única começa na hora mesmo com uma playlist enorme rodando.
+    """
+
+    def __init__(self, capacity, reserved=0):
+        self.capacity = max(1, capacity)
+        self.reserved = max(0, min(reserved, self.capacity - 1))
+        self.in_use = 0
+        self._cond = threading.Condition()
+        self._waiting = []  # (prioridade, seq)
+        self._seq = itertools.count()
+
+    def _limit(self, priority):
+        return self.capacity if priority == PRIORITY_INTERACTIVE else self.capacity - self.reserved
+
+    def acquire(self, priority=PRIORITY_BULK):
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            while self._waiting[0] != ticket or self.in_use >= self._limit(priority):
+                self._cond.wait()
+            heapq.heappop(self._waiting)
+            self.in_use += 1
+            # O próximo da fila pode caber também
+            self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self.in_use -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority=PRIORITY_BULK):
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class JobScheduler:
+    """Fila única para os trabalhos do app: downloads, análises e capas.
+
+    Os jobs saem da fila por prioridade e no máximo `max_jobs` não
+    interativos rodam ao mesmo tempo; os interativos furam o limite e
+    começam na hora. Dentro de cada job, cada download ou busca pede uma
+    vaga em `slots` e um token ao RATE_LIMITER, os dois com a prioridade do
+    job, então o lote cede a vez sempre que alguém está esperando na tela.
+    """
+
+    def __init__(self, max_jobs=MAX_RUNNING_JOBS, slots=None):
+        self.max_jobs = max(1, max_jobs)
+        self.slots = slots or PrioritySlots(MAX_CONCURRENT_DOWNLOADS, INTERACTIVE_RESERVED_SLOTS)
+        self._lock = threading.Lock()
+        self._queue = []  # (prioridade, seq, job, fn)
+        self._seq = itertools.count()
+        self._busy = 0
+
+    def submit(self, name, fn, priority=PRIORITY_BULK):
+        """Enfileira fn(job) e retorna o Job; a thread só nasce quando ele sai da fila"""
+        job = Job(name, priority)
+        with self._lock:
+            heapq.heappush(self._queue, (priority, next(self._seq), job, fn))
+        self._dispatch()
+        return job
+
+    def _dispatch(self):
+        with self._lock:
+            while self._queue:
+                priority, _, job, fn = self._queue[0]
+                if priority != PRIORITY_INTERACTIVE and self._busy >= self.max_jobs:
+                    break
+                heapq.heappop(self._queue)
+                if priority != PRIORITY_INTERACTIVE:
+                    self._busy += 1
+                threading.Thread(target=self._run, args=(job, fn), name=f"job-{job.id}", daemon=True).start()
+
+    def _run(self, job, fn):
+        try:
+            # Roda mesmo se foi cancelado na fila: quem chamou limpa o que
+            # preparou e o cancelamento aparece no primeiro checkpoint
+            job.result = fn(job)
+        except JobCancelled:
+            pass
+        except Exception as e:
+            job.error = e
+            print(f"Erro no job {job.name}: {e}")
+        finally:
+            if job.priority != PRIORITY_INTERACTIVE:
+                with self._lock:
+                    self._busy -= 1
+            job._done.set()
+            self._dispatch()
+
+
+# Agendador compartilhado por todas as abas e pela linha de comando
+SCHEDULER = JobScheduler()
+
+# =============================================================================
+# 🚀 MOTOR DE DOWNLOADS (POOL DE WORKERS)
+# =============================================================================
+
+class DownloadFailed(Exception):
+    """O yt-dlp terminou sem lançar exceção, mas não conseguiu baixar o item"""
+
+
+class TagWriteFailed(DownloadFailed):
+    """O áudio foi salvo, mas o TagWriter não gravou as tags (baixar de novo não adianta)"""
+
+
+class DownloadItem:
+    """Um item da fila de downloads"""
+    __slots__ = ("index", "url", "attempts", "error")
+
+    def __init__(self, index, url):
+        self.index = index
+        self.url = url
+        self.attempts = 0
+        self.error = None
+
+
+class DownloadEngine:
+    """Pool de workers que consome uma fila compartilhada de URLs.
+
+    Um item que falha volta para a fila com um tempo de espera próprio,
+    então as novas tentativas não travam os outros workers. O ritmo das
+    requisições vem do RateController (por padrão o RATE_LIMITER global).
+    Depois de `open_input()`, a fila aceita novos itens com `add()` durante
+    o `run()`, que só termina depois de `close_input()`.
+    Cada worker cria uma única sessão com `session_factory()` e a reutiliza
+    em todos os itens que processar. Com uma `library`, URLs de músicas que
+    já estão no disco são puladas antes de qualquer acesso à rede. Com um
+    `transcoder`, os downloads que voltam como StagedDownload são entregues
+    a ele e o worker já parte para o próximo item.
+    Com um `job` do SCHEDULER, as vagas e o ritmo são pedidos com a
+    prioridade dele, os workers param entre um item e outro enquanto ele
+    estiver pausado e cancelá-lo equivale a stop().
+    """
+
+    def __init__(self, session_factory, workers=4, max_retries=3, pacer=None, on_progress=None, journal=None,
+                 library=None, transcoder=None, job=None):
+        self.session_factory = session_factory
+        self.job = job
+        self.priority = job.priority if job else PRIORITY_BULK
+        self.journal = journal
+        self.library = library
+        self.transcoder = transcoder
+        self.workers = max(1, min(workers, MAX_CONCURRENT_DOWNLOADS))
+        self.max_retries = max(1, max_retries)
+        self.pacer = pacer
+        self.on_progress = on_progress
+
+        self._cond = threading.Condition()
+        self._heap = []  # (pronto_em, seq, item)
+        self._seq = itertools.count()
+        self._pending = 0
+        self._stopped = False
+        self._open = False
+
+        self.total = 0
+        self.active = 0
+        self.converting = 0
+        self.success = 0
+        self.skipped = 0
+        self.failed = []
+        if job:
+            job.on_cancel(self.stop)
+
+    @property
+    def done(self):
+        return self.success + len(self.failed)
+
+    def run(self, urls, indexes=None):
+        """Baixa todas as URLs e bloqueia até o fim. Retorna (total, sucesso, falhas)
+
+        `indexes` dá a posição de cada URL no job original (usado ao retomar).
+        """
+        if self.pacer is None:
+            self.pacer = RATE_LIMITER
+        self.add(urls, indexes)
+        with self._cond:
+            # Itens podem ter chegado por add() antes do run()
+            workers = self.workers if self._open else min(self.workers, self._pending)
+        threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if self.transcoder:
+            # Depois de um stop(), as conversões já entregues ainda terminam
+            self.transcoder.join()
+
+        self.failed.sort(key=lambda item: item.index)
+        failed = [f"Item {item.index+1}: {str(item.error)[:100]}" for item in self.failed]
+        return self.total, self.success, failed
+
+    def add(self, urls, indexes=None):
+        """Enfileira URLs (também com o run() em andamento). Retorna quantas entraram"""
+        if indexes is None:
+            indexes = range(self.total, self.total + len(urls))
+        items = [DownloadItem(i, url) for i, url in zip(indexes, urls)]
+        with self._cond:
+            for item in items:
+                heapq.heappush(self._heap, (0, next(self._seq), item))
+            self._pending += len(items)
+            self.total += len(items)
+            self._cond.notify_all()
+        return len(items)
+
+    def open_input(self):
+        """Mantém os workers esperando por add() mesmo com a fila vazia"""
+        with self._cond:
+            self._open = True
+
+    def close_input(self):
+        """Não vêm mais itens: o run() termina quando a fila esvaziar"""
+        with self._cond:
+            self._open = False
+            self._cond.notify_all()
+
+    def stop(self):
+        """Esvazia a fila; os downloads em andamento terminam normalmente"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    @property
+    def stopped(self):
+        return self._stopped
+
+    def _next_item(self):
+        with self._cond:
+            while True:
+                if self._stopped or (self._pending == 0 and not self._open):
+                    return None
+                if self._heap:
+                    ready_at, _, item = self._heap[0]
+                    wait = ready_at - time.monotonic()
+                    if wait <= 0:
+                        heapq.heappop(self._heap)
+                        self.active += 1
+                        return item
+                    self._cond.wait(wait)
+                else:
+                    # Nada pronto: espera algum worker terminar ou reenfileirar
+                    self._cond.wait()
+
+    def _worker(self):
+        session = None
+        try:
+            while True:
+                if self.job:
+                    try:
+                        self.job.checkpoint()
+                    except JobCancelled:
+                        return
+                item = self._next_item()
+                if item is None:
+                    return
+                if self._already_owned(item):
+                    self._finish(item, ok=True, skipped=True)
+                    continue
+
+                item.attempts += 1
+                self.pacer.acquire(self.priority)
+                self._notify("start", item)
+                try:
+                    if session is None:
+                        session = self.session_factory()
+                    with SCHEDULER.slots.slot(self.priority):
+                        result = session.download(item.url)
+                except Exception as e:
+                    item.error = e
+                    self.pacer.record_failure(e)
+                    self._finish(item, ok=False)
+                else:
+                    self.pacer.record_success()
+                    if isinstance(result, StagedDownload) and self.transcoder:
+                        self._hand_off(item, result)
+                    else:
+                        self._finish(item, ok=True)
+        finally:
+            if session is not None:
+                session.close()
+
+    def _hand_off(self, item, staged):
+        with self._cond:
+            self.active -= 1
+            self.converting += 1
+        self._notify("staged", item)
+        # Bloqueia enquanto a fila de conversão estiver cheia (contrapressão)
+        self.transcoder.submit(staged, lambda error: self._converted(item, error))
+
+    def _converted(self, item, error):
+        if error is not None:
+            item.error = error
+        self._finish(item, ok=error is None, converted=True)
+
+    def _already_owned(self, item):
+        if not self.library:
+            return False
+        try:
+            return self.library.has(video_id_from_url(item.url)) is not None
+        except sqlite3.Error as e:
+            print(f"Erro ao consultar a biblioteca: {e}")
+            return False
+
+    def _finish(self, item, ok, skipped=False, converted=False):
+        with self._cond:
+            if converted:
+                self.converting -= 1
+            else:
+                self.active -= 1
+            if skipped:
+                self.success += 1
+                self.skipped += 1
+                event = "skipped"
+            elif ok:
+                self.success += 1
+                event = "done"
+            elif item.attempts < self.max_retries and not isinstance(item.error, TagWriteFailed):
+                # Volta para a fila com espera crescente, sem segurar este worker
+                ready_at = time.monotonic() + self.pacer.retry_delay(item.attempts)
+                heapq.heappush(self._heap, (ready_at, next(self._seq), item))
+                event = "retry"
+            else:
+                self.failed.append(item)
+                print(f"Falha após {item.attempts} tentativas: {item.url}")
+                event = "failed"
+
+            if event != "retry":
+                self._pending -= 1
+            self._cond.notify_all()
+        self._notify(event, item)
+
+    # Estado gravado no diário para cada evento do motor
+    JOURNAL_STATES = {"start": "running", "staged": "running", "retry": "pending", "done": "done", "skipped": "done", "failed": "failed"}
+
+    def _notify(self, event, item):
+        if self.journal:
+            try:
+                self.journal.mark(item.index, self.JOURNAL_STATES[event], item.error if event not in ("done", "skipped") else None)
+            except OSError as e:
+                print(f"Erro ao gravar diário do job: {e}")
+        if self.on_progress:
+            try:
+                self.on_progress(event, item, self)
+            except Exception as e:
+                print(f"Erro no callback de progresso: {e}")
+
+# =============================================================================
+# ⚗️ CONVERSÃO EM SEGUNDO PLANO (SEGUNDA ETAPA DO PIPELINE)
+# =============================================================================
+
+class TranscodePool:
+    """Pós-processa (FFmpeg, capa, tags, mover) o que os workers de rede
+    deixaram na pasta de preparo.
+
+    Uma thread por núcleo, cada uma com o seu YoutubeDL (que não acessa a
+    rede) e o seu TrackRecorder; o FFmpeg roda em processo filho, então as
+    conversões ocupam os núcleos de verdade enquanto os workers já baixam as
+    próximas músicas. A fila é limitada: quando a CPU não dá conta, `submit`
+    bloqueia e os downloads esperam em vez de encher a pasta de preparo.
+    `opts_factory(recorder)` monta as opções do yt-dlp de cada thread.
+    """
+
+    def __init__(self, opts_factory, stats=None, workers=None, backlog=None, library=None):
+        self.opts_factory = opts_factory
+        self.stats = stats
+        self.library = library
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self._queue = queue.Queue(maxsize=max(1, backlog or self.workers))
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, staged, callback):
+        """Enfileira a música; `callback(erro ou None)` roda quando ela estiver pronta.
+
+        O callback roda na thread de conversão ou, se as tags vão para o
+        TAG_WRITER, na thread dele, depois que elas forem gravadas.
+        """
+        with self._lock:
+            if not self._threads:
+                self._threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(self.workers)]
+                for t in self._threads:
+                    t.start()
+        self._queue.put((staged, callback))
+
+    def join(self):
+        """Espera a fila esvaziar e as conversões em andamento terminarem"""
+        self._queue.join()
+
+    def close(self):
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for t in threads:
+            t.join()
+
+    def _worker(self):
+        recorder = TrackRecorder(self.stats) if self.stats is not None else None
+        log = YdlLogger()
+        tags = []  # gravações de tags pedidas pela música atual
+        ydl = None
+        try:
+            while True:
+                job = self._queue.get()
+                if job is None:
+                    self._queue.task_done()
+                    return
+                staged, callback = job
+                error = None
+                del tags[:]
+                try:
+                    if ydl is None:
+                        import yt_dlp
+                        opts = dict(self.opts_factory(recorder), logger=log)
+                        # Sem rede: não lê nem regrava o arquivo de cookies dos workers de download
+                        opts.pop('cookiefile', None)
+                        ydl = yt_dlp.YoutubeDL(opts)
+                        if in_process_tags():
+                            ydl.add_post_processor(make_tag_stage(ydl, TAG_WRITER, tags), when='after_move')
+                    self._process(ydl, log, recorder, staged)
+                except Exception as e:
+                    error = e
+                    # Estado desconhecido: recria o YoutubeDL na próxima música
+                    self._close(ydl)
+                    ydl = None
+                try:
+                    if error is None and tags:
+                        # A música só termina quando o TagWriter gravar as tags (sem segurar esta thread)
+                        self._when_tagged(list(tags), callback)
+                    else:
+                        self._call(callback, error)
+                finally:
+                    self._queue.task_done()
+        finally:
+            self._close(ydl)
+
+    def _when_tagged(self, futures, callback):
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def tagged(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            self._call(callback, tags_error(futures))
+
+        for future in futures:
+            future.add_done_callback(tagged)
+
+    @staticmethod
+    def _call(callback, error):
+        try:
+            callback(error)
+        except Exception as e:
+            print(f"Erro no callback de conversão: {e}")
+
+    @staticmethod
+    def _close(ydl):
+        if ydl is not None:
+            try:
+                ydl.close()
+            except Exception as e:
+                print(f"Erro ao fechar conversor do yt-dlp: {e}")
+
+    def _process(self, ydl, log, recorder, staged):
+        if recorder:
+            recorder.attach(staged.track, time.monotonic() - staged.staged_at)
+        log.errors.clear()
+        try:
+            for info in staged.infos:
+                # Correções que o yt-dlp agendou no download pertencem ao YoutubeDL da rede
+                for pp in info.get('__postprocessors') or []:
+                    pp.set_downloader(ydl)
+                info = ydl.post_process(info['filepath'], info, info.get('__files_to_move'))
+                if log.errors:
+                    # Com ignoreerrors, o yt-dlp só registra o erro do pós-processador
+                    raise DownloadFailed(log.errors[-1])
+                if self.library and info.get('id') and info.get('filepath'):
+                    register_download(self.library, info['id'], info['filepath'])
+        except Exception as e:
+            if recorder:
+                recorder.end(False, e)
+            raise
+        if recorder:
+            recorder.end(True)
+
+
+# =============================================================================
+# 📓 DIÁRIO DE JOBS (RETOMAR DOWNLOADS INTERROMPIDOS)
+# =============================================================================
+
+JOBS_DIR = os.path.join(APPLICATION_PATH, "jobs")
+
+
+class JobJournal:
+    """Diário append-only de um job de download em lote.
+
+    A primeira linha descreve o job (URLs e opções); cada linha seguinte
+    registra a mudança de estado de um item (pending, running, done, failed)
+    ou, num job em streaming, as URLs que chegaram depois (`extend`). Um
+    job em streaming guarda os links de origem em options['links'] e só
+    deixa de estar "alimentando" quando a análise deles termina (`mark_fed`).
+    Toda linha vai para o disco com fsync, então se o programa fechar ou
+    travar, reler o arquivo mostra exatamente onde o job parou.
+    """
+
+    PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+    def __init__(self, path, job):
+        self.path = path
+        self.job = job
+        self.states = {}
+        self.errors = {}
+        self.fed = False
+        self._known = set(job['urls'])
+        self._lock = threading.Lock()
+        self._file = None
+
+    @property
+    def urls(self):
+        return self.job['urls']
+
+    @property
+    def options(self):
+        return self.job['options']
+
+    @property
+    def feeding(self):
+        """Job em streaming cuja análise ainda não terminou (os links seriam analisados de novo)"""
+        return bool(self.options.get('links')) and not self.fed
+
+    @classmethod
+    def create(cls, urls, options, folder=JOBS_DIR):
+        os.makedirs(folder, exist_ok=True)
+        job_id = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        job = {'type': 'job', 'id': job_id, 'created': time.time(), 'urls': list(urls), 'options': options}
+        journal = cls(os.path.join(folder, f"{job_id}.jsonl"), job)
+        journal._append(job)
+        return journal
+
+    @classmethod
+    def load(cls, path):
+        """Relê um diário. Uma última linha pela metade (queda no meio da escrita) é ignorada"""
+        journal = None
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('type') == 'job':
+                    journal = cls(path, record)
+                elif journal and record.get('type') == 'urls':
+                    journal.urls.extend(record['urls'])
+                    journal._known.update(record['urls'])
+                elif journal and record.get('type') == 'fed':
+                    journal.fed = True
+                elif journal and record.get('type') == 'state':
+                    journal.states[record['index']] = record['state']
+                    if record.get('error'):
+                        journal.errors[record['index']] = record['error']
+                    else:
+                        journal.errors.pop(record['index'], None)
+        return journal
+
+    def extend(self, urls):
+        """Acrescenta as URLs que o job ainda não tem. Retorna (índice da primeira, URLs acrescentadas)"""
+        start = len(self.urls)
+        new = [url for url in dict.fromkeys(urls) if url not in self._known]
+        if new:
+            self.urls.extend(new)
+            self._known.update(new)
+            self._append({'type': 'urls', 'urls': new})
+        return start, new
+
+    def mark_fed(self):
+        """A análise dos links do job em streaming terminou: não há mais URLs por vir"""
+        self.fed = True
+        self._append({'type': 'fed', 'ts': time.time()})
+
+    def is_unfinished(self):
+        return bool(self.unfinished_indexes()) or self.feeding
+
+    def mark(self, index, state, error=None):
+        self.states[index] = state
+        if error:
+            self.errors[index] = str(error)[:300]
+        self._append({'type': 'state', 'index': index, 'state': state,
+                      'error': str(error)[:300] if error else None, 'ts': time.time()})
+
+    def unfinished_indexes(self):
+        """Itens que não chegaram a done/failed (pending ou interrompidos em running)"""
+        return [i for i in range(len(self.urls))
+                if self.states.get(i, self.PENDING) in (self.PENDING, self.RUNNING)]
+
+    def counts(self):
+        done = sum(1 for state in self.states.values() if state == self.DONE)
+        failed = sum(1 for state in self.states.values() if state == self.FAILED)
+        return done, failed
+
+    def _append(self, record):
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+                if self._ends_mid_line():
+                    # Isola a linha cortada por uma queda anterior
+                    self._file.write("\n")
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def _ends_mid_line(self):
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() == 0:
+                    return False
+                f.seek(-1, os.SEEK_END)
+                return f.read(1) != b"\n"
+        except OSError:
+            return False
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def finish(self):
+        """Job terminou: o diário não é mais necessário"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError as e:
+            print(f"Erro ao remover diário do job: {e}")
+
+    def discard(self):
+        self.finish()
+
+
+def find_unfinished_jobs(folder=JOBS_DIR):
+    """Diários com itens ainda pendentes, do mais recente para o mais antigo"""
+    jobs = []
+    try:
+        names = sorted(os.listdir(folder), reverse=True)
+    except OSError:
+        return jobs
+    for name in names:
+        if not name.endswith(".jsonl"):
+            continue
+        try:
+            journal = JobJournal.load(os.path.join(folder, name))
+        except OSError as e:
+            print(f"Erro ao ler diário {name}: {e}")
+            continue
+        if journal and journal.is_unfinished():
+            jobs.append(journal)
+    return jobs
+
+
+# =============================================================================
+# 🗃️ BIBLIOTECA LOCAL (PULAR O QUE JÁ FOI BAIXADO)
+# =============================================================================
+
+# Índice SQLite das músicas já baixadas e dos arquivos das pastas varridas
+LIBRARY_DB = os.path.join(APPLICATION_PATH, "midnight_library.db")
+
+# Extensões consideradas música na varredura das pastas
+AUDIO_EXTENSIONS = ('.mp3', '.m4a', '.opus', '.ogg', '.flac', '.wav', '.webm')
+
+_VIDEO_ID_RE = re.compile(r'(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/)([0-9A-Za-z_-]{11})')
+
+
+def normalize_text(text):
+    """Minúsculas, sem acentos e sem pontuação: "Beyoncé - Halo!" -> "beyonce halo" """
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[\W_]+', ' ', text.lower()).split())
+
+
+def split_artist_title(filename):
+    """Artista e título normalizados a partir do nome do arquivo (outtmpl "artista - título.ext")"""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    artist, sep, title = stem.partition(' - ')
+    if not sep:
+        artist, title = '', stem
+    return normalize_text(artist), normalize_text(title)
+
+
+def video_id_from_url(url):
+    """ID do vídeo do YouTube contido na URL, ou None (buscas e outros sites)"""
+    match = _VIDEO_ID_RE.search(url or '')
+    return match.group(1) if match else None
+
+
+class LibraryIndex:
+    """Índice das músicas que já estão no disco.
+
+    `tracks` liga o ID do vídeo ao arquivo baixado, então um item da
+    playlist que já existe é pulado com uma consulta, antes de qualquer
+    acesso à rede. `files` e `dirs` guardam o resultado da varredura das
+    pastas: uma pasta cujo mtime não mudou não é listada de novo, e nenhum
+    arquivo é aberto, só o stat que o scandir já entrega.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tracks (
+            video_id TEXT PRIMARY KEY, path TEXT NOT NULL, size INTEGER,
+            artist TEXT, title TEXT, added_at REAL);
+        CREATE INDEX IF NOT EXISTS tracks_path ON tracks(path);
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY, dir TEXT NOT NULL, size INTEGER, mtime_ns INTEGER,
+            artist TEXT, title TEXT);
+        CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+        CREATE INDEX IF NOT EXISTS files_name ON files(artist, title);
+        CREATE TABLE IF NOT EXISTS dirs (
+            path TEXT PRIMARY KEY, mtime_ns INTEGER, subdirs TEXT);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._db = None
+
+    def _conn(self):
+        # Aberto só no primeiro uso; compartilhado entre threads atrás do lock
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(self.SCHEMA)
+            self._db = db
+        return self._db
+
+    def has(self, video_id):
+        """Caminho do arquivo se o vídeo já foi baixado e o arquivo ainda existe, senão None"""
+        if not video_id:
+            return None
+        with self._lock:
+            row = self._conn().execute("SELECT path FROM tracks WHERE video_id = ?", (video_id,)).fetchone()
+            if row is None:
+                return None
+            if os.path.isfile(row[0]):
+                return row[0]
+            # Arquivo apagado ou movido: esquece e baixa de novo
+            with self._db:
+                self._db.execute("DELETE FROM tracks WHERE video_id = ?", (video_id,))
+            return None
+
+    def find_by_name(self, artist, title):
+        """Caminho de um arquivo com o mesmo artista e título (normalizados), ou None"""
+        artist, title = normalize_text(artist), normalize_text(title)
+        if not title:
+            return None
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT path FROM files WHERE artist = ? AND title = ? LIMIT 1", (artist, title)).fetchone()
+        return row[0] if row else None
+
+    def add_track(self, video_id, path):
+        """Registra uma música recém-baixada"""
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        artist, title = split_artist_title(path)
+        with self._lock, self._conn() as db:
+            db.execute("INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?, ?, ?)",
+                       (video_id, path, st.st_size, artist, title, time.time()))
+            db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                       (path, os.path.dirname(path), st.st_size, st.st_mtime_ns, artist, title))
+
+    def scan(self, root):
+        """Atualiza o índice com o conteúdo de `root` e suas subpastas.
+
+        Só as pastas com mtime diferente do registrado são listadas de novo
+        (criar, apagar ou renomear arquivo muda o mtime da pasta). Retorna
+        quantas pastas precisaram ser relidas.
+        """
+        root = os.path.abspath(root)
+        changed = 0
+        seen = set()
+        pending = [root]
+        with self._lock:
+            db = self._conn()
+            known = {path: (mtime, json.loads(subdirs or '[]'))
+                     for path, mtime, subdirs in db.execute("SELECT path, mtime_ns, subdirs FROM dirs")}
+            with db:
+                while pending:
+                    folder = pending.pop()
+                    try:
+                        mtime = os.stat(folder).st_mtime_ns
+                    except OSError:
+                        continue
+                    seen.add(folder)
+                    if folder in known and known[folder][0] == mtime:
+                        pending.extend(known[folder][1])
+                        continue
+                    changed += 1
+                    subdirs = self._scan_dir(db, folder)
+                    db.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)", (folder, mtime, json.dumps(subdirs)))
+                    pending.extend(subdirs)
+
+                # Pastas que sumiram de dentro de `root`
+                prefix = os.path.join(root, '')
+                for folder in known:
+                    if folder not in seen and (folder == root or folder.startswith(prefix)):
+                        db.execute("DELETE FROM dirs WHERE path = ?", (folder,))
+                        db.execute("DELETE FROM files WHERE dir = ?", (folder,))
+                db.execute("DELETE FROM tracks WHERE substr(path, 1, ?) = ? AND path NOT IN (SELECT path FROM files)",
+                           (len(prefix), prefix))
+        return changed
+
+    def _scan_dir(self, db, folder):
+        subdirs = []
+        found = {}
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name != STAGING_DIR_NAME:
+                                subdirs.append(entry.path)
+                        elif entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                            st = entry.stat()
+                            found[entry.path] = (st.st_size, st.st_mtime_ns)
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"Erro ao varrer {folder}: {e}")
+            return subdirs
+        db.execute("DELETE FROM files WHERE dir = ?", (folder,))
+        db.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                       [(path, folder, size, mtime) + split_artist_title(path)
+                        for path, (size, mtime) in found.items()])
+        return subdirs
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+LIBRARY = LibraryIndex(LIBRARY_DB)
+
+
+# =============================================================================
+# 🚦 CONTROLE DE RITMO (TOKEN BUCKET + AIMD)
+# =============================================================================
+
+# Trechos de mensagens de erro que indicam que o servidor está segurando a gente
+THROTTLE_MARKERS = (
+    "429", "too many requests", "rate limit", "rate-limit",
+    "sign in to confirm", "not a bot", "http error 403",
+)
+
+
+def is_throttle_error(error):
+    """Diz se o erro é um sinal de bloqueio/limite do lado remoto"""
+    if isinstance(error, TagWriteFailed):
+        # Falha local (mutagen/disco): a rede não tem culpa
+        return False
+    if isinstance(error, DownloadFailed):
+        # Erro que o yt-dlp só registrou no logger (ignoreerrors): trata como sinal de recuo
+        return True
+    text = str(error).lower()
+    return any(marker in text for marker in THROTTLE_MARKERS)
+
+
+class RateController:
+    """Orçamento de requisições compartilhado entre análise e downloads.
+
+    Um token bucket libera as requisições na taxa atual (req/s). Cada sucesso
+    soma `increase` à taxa; cada bloqueio multiplica a taxa por `decrease` e
+    esvazia o balde (AIMD).
+    """
+
+    def __init__(self, rate=0.5, min_rate=0.02, max_rate=4.0, burst=2, increase=0.05, decrease=0.5):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.rate = rate
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._throttled_at = 0
+        self._interactive_waiting = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority=PRIORITY_BULK):
+        """Bloqueia até haver um token disponível.
+
+        Enquanto houver um pedido interativo esperando, os outros não pegam
+        token: o próximo que sair do balde é dele.
+        """
+        interactive = priority == PRIORITY_INTERACTIVE
+        if interactive:
+            with self._lock:
+                self._interactive_waiting += 1
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._tokens >= 1 and (interactive or not self._interactive_waiting):
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+                time.sleep(min(max(wait, 0.05), 1.0))
+        finally:
+            if interactive:
+                with self._lock:
+                    self._interactive_waiting -= 1
+
+    def record_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def record_failure(self, error):
+        """Registra uma falha; recua só se ela parecer bloqueio. Retorna se recuou"""
+        if not is_throttle_error(error):
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._tokens = 0.0
+            self._throttled_at = now
+        return True
+
+    def retry_delay(self, attempts):
+        """Espera antes de uma nova tentativa, proporcional ao ritmo atual"""
+        with self._lock:
+            interval = 1.0 / self.rate
+        return min(120.0, interval * (2 ** max(0, attempts - 1)))
+
+    def start_job(self, interval):
+        """Usa o intervalo configurado como ritmo inicial de um job.
+
+        Se houve bloqueio no último minuto, mantém a taxa reduzida.
+        """
+        with self._lock:
+            if time.monotonic() - self._throttled_at < 60:
+                return
+            self.rate = max(self.min_rate, min(self.max_rate, 1.0 / max(interval, 0.1)))
+
+
+# Ritmo compartilhado por análise, capas e downloads
+RATE_LIMITER = RateController()
+
+# =============================================================================
+# 📶 BANDA (ORÇAMENTO DE BYTES/S COMPARTILHADO ENTRE DOWNLOADS)
+# =============================================================================
+
+# Tamanho fixo dos blocos lidos pelo yt-dlp: com o limite ligado, a banda sai
+# lisa (sem blocos de vários MB seguidos de longas pausas)
+BANDWIDTH_BLOCK_SIZE = 64 * 1024
+# Quanto de folga acumulada cada balde aceita, em segundos do limite
+BANDWIDTH_BURST_SECONDS = 1.0
+# Espera máxima de cada vez: um limite alterado vale em menos que isso
+BANDWIDTH_MAX_SLEEP = 0.25
+
+
+def bandwidth_limits(config=None):
+    """Limites da configuração em bytes/s: {'interactive': ..., 'bulk': ...} (0 = livre)"""
+    config = config if config is not None else CONFIG.snapshot()
+    limits = {}
+    for name in ("interactive", "bulk"):
+        try:
+            limits[name] = max(0, int(config.get(f"bandwidth_{name}_kbps") or 0)) * 1024
+        except (TypeError, ValueError):
+            limits[name] = 0
+    return limits
+
+
+class BandwidthLimiter:
+    """Orçamento de banda por classe (interativos e lote), somando todos os downloads.
+
+    Cada classe tem um token bucket que aceita dívida: cada bloco é cobrado
+    depois de lido e quem deixou o balde negativo dorme até pagar. Com
+    vários downloads ao mesmo tempo, a soma deles fica colada no limite, em
+    vez de ociosa entre uma música e outra como com o delay. Os limites
+    vêm da configuração (relida a cada mudança) ou de set_limits().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rates = None
+        self._tokens = {"interactive": 0.0, "bulk": 0.0}
+        self._updated = {"interactive": time.monotonic(), "bulk": time.monotonic()}
+
+    def set_limits(self, interactive=0, bulk=0):
+        """Limites em bytes/s (0 = livre); valem na hora, também para os downloads em andamento"""
+        with self._lock:
+            now = time.monotonic()
+            if self._rates is None:
+                self._rates = {"interactive": 0, "bulk": 0}
+            for name, rate in (("interactive", interactive), ("bulk", bulk)):
+                self._refill(name, now)
+                self._rates[name] = max(0, int(rate))
+                self._tokens[name] = min(self._tokens[name], self._rates[name] * BANDWIDTH_BURST_SECONDS)
+
+    def limited(self, priority=PRIORITY_BULK):
+        """Se a classe de `priority` tem limite agora"""
+        self._ensure_limits()
+        with self._lock:
+            return bool(self._rates[self._class(priority)])
+
+    @staticmethod
+    def _class(priority):
+        return "interactive" if priority == PRIORITY_INTERACTIVE else "bulk"
+
+    def _ensure_limits(self):
+        if self._rates is None:
+            self.set_limits(**bandwidth_limits())
+
+    def _refill(self, name, now):
+        rate = self._rates[name] if self._rates else 0
+        if rate:
+            self._tokens[name] = min(rate * BANDWIDTH_BURST_SECONDS,
+                                     self._tokens[name] + (now - self._updated[name]) * rate)
+        self._updated[name] = now
+
+    def consume(self, nbytes, priority=PRIORITY_BULK):
+        """Cobra `nbytes` já lidos e dorme o necessário para a média da classe ficar no limite"""
+        self._ensure_limits()
+        name = self._class(priority)
+        with self._lock:
+            if not self._rates[name]:
+                return
+            self._refill(name, time.monotonic())
+            self._tokens[name] -= nbytes
+        while True:
+            with self._lock:
+                rate = self._rates[name]
+                if not rate:
+                    return
+                self._refill(name, time.monotonic())
+                if self._tokens[name] >= 0:
+                    return
+                wait = -self._tokens[name] / rate
+            time.sleep(min(wait, BANDWIDTH_MAX_SLEEP))
+
+
+def bandwidth_hook(priority=None, limiter=None):
+    """Hook de progresso do yt-dlp que passa cada bloco baixado pelo BANDWIDTH.
+
+    O yt-dlp chama os hooks depois de cada bloco lido, então dormir aqui
+    segura a própria leitura. O primeiro aviso de cada arquivo não é
+    cobrado (pode trazer o que já existia de um download retomado).
+    """
+    limiter = limiter or BANDWIDTH
+    priority = PRIORITY_BULK if priority is None else priority
+    seen = {}
+
+    def hook(d):
+        key = d.get('tmpfilename') or d.get('filename')
+        if d.get('status') != 'downloading':
+            seen.pop(key, None)
+            return
+        done = d.get('downloaded_bytes') or 0
+        previous = seen.get(key)
+        seen[key] = done
+        if previous is not None and done > previous:
+            limiter.consume(done - previous, priority)
+
+    return hook
+
+
+# Banda compartilhada por todos os downloads (aba única, lote e linha de comando)
+BANDWIDTH = BandwidthLimiter()
+
+
+def _on_bandwidth_config(old, new):
+    if bandwidth_limits(old) != bandwidth_limits(new):
+        BANDWIDTH.set_limits(**bandwidth_limits(new))
+
+
+CONFIG.subscribe(_on_bandwidth_config)
+
+# =============================================================================
+# 📈 MÉTRICAS POR MÚSICA E POR ETAPA
+# =============================================================================
+
+# Log estruturado (uma linha JSON por música)
+METRICS_LOG = os.path.join(APPLICATION_PATH, "logs", "metrics.jsonl")
+
+# Nome da etapa para cada pós-processador do yt-dlp (pelo pp_key)
+STAGE_NAMES = {
+    'ExtractAudio': 'transcode',
+    'AlbumArt': 'cover',
+    'EmbedThumbnail': 'thumbnail',
+    'Metadata': 'metadata',
+    'MoveFilesAfterDownload': 'move',
+    'MoveFiles': 'move',
+}
+
+# Ordem em que as etapas aparecem nos resumos
+STAGE_ORDER = ('resolve', 'cover', 'download', 'queue', 'transcode', 'thumbnail', 'metadata', 'tags', 'move', 'total')
+
+
+def percentile(values, pct):
+    """Percentil pelo método do posto mais próximo"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class JobStats:
+    """Junta as medições das músicas de um job e grava cada uma no log JSON-lines"""
+
+    def __init__(self, log_path=METRICS_LOG):
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self.records = []
+
+    def add(self, record):
+        with self._lock:
+            self.records.append(record)
+            try:
+                os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"Erro ao gravar métricas: {e}")
+
+    def throughput(self):
+        """MB/s médio da etapa de download"""
+        with self._lock:
+            total_bytes = sum(r['bytes'] for r in self.records)
+            seconds = sum(r['stages'].get('download', 0) for r in self.records)
+        return total_bytes / seconds / 1e6 if seconds else None
+
+    def summary(self):
+        """{etapa: (p50, p95)} das músicas que deram certo"""
+        with self._lock:
+            records = [r for r in self.records if r['ok']]
+        result = {}
+        for stage in STAGE_ORDER:
+            values = [r['stages'][stage] if stage != 'total' else r['total']
+                      for r in records if stage == 'total' or stage in r['stages']]
+            if values:
+                result[stage] = (percentile(values, 50), percentile(values, 95))
+        return result
+
+    def summary_text(self):
+        parts = [f"{stage} {p50:.1f}s/{p95:.1f}s" for stage, (p50, p95) in self.summary().items()]
+        speed = self.throughput()
+        if speed:
+            parts.append(f"{speed:.2f} MB/s")
+        return " • ".join(parts)
+
+
+class TrackRecorder:
+    """Hooks de progresso e de pós-processamento do yt-dlp para uma sessão.
+
+    Uma sessão baixa um item por vez, então basta um registro "atual".
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.current = None
+
+    def begin(self, url):
+        self.current = {
+            'url': url, 'id': None, 'title': None,
+            'started': time.monotonic(), 'first_byte': None,
+            'bytes': 0, 'speed': None, 'eta': None,
+            'stages': {}, 'pp_started': {},
+        }
+
+    def progress_hook(self, d):
+        track = self.current
+        if track is None:
+            return
+        info = d.get('info_dict') or {}
+        track['id'] = track['id'] or info.get('id')
+        track['title'] = track['title'] or info.get('title')
+        now = time.monotonic()
+        if track['first_byte'] is None:
+            # Tudo até aqui foi busca/extração
+            track['first_byte'] = now
+            track['stages']['resolve'] = now - track['started']
+        if d.get('status') == 'downloading':
+            track['speed'] = d.get('speed') or track['speed']
+            track['eta'] = d.get('eta')
+        elif d.get('status') == 'finished':
+            track['bytes'] += d.get('total_bytes') or d.get('downloaded_bytes') or 0
+            elapsed = d.get('elapsed') or (now - track['first_byte'])
+            track['stages']['download'] = track['stages'].get('download', 0) + elapsed
+
+    def detach(self):
+        """Entrega a música atual para ser terminada por outro recorder (outra thread)"""
+        track, self.current = self.current, None
+        return track
+
+    def attach(self, track, waited=None):
+        """Continua a medir uma música entregue por `detach`; `waited` é o tempo na fila"""
+        self.current = track
+        if track is not None and waited is not None:
+            track['stages']['queue'] = track['stages'].get('queue', 0) + waited
+
+    def postprocessor_hook(self, d):
+        track = self.current
+        if track is None:
+            return
+        name = STAGE_NAMES.get(d.get('postprocessor'), str(d.get('postprocessor')).lower())
+        if d.get('status') == 'started':
+            track['pp_started'][name] = time.monotonic()
+        elif d.get('status') == 'finished' and name in track['pp_started']:
+            elapsed = time.monotonic() - track['pp_started'].pop(name)
+            track['stages'][name] = track['stages'].get(name, 0) + elapsed
+
+    def end(self, ok, error=None):
+        track, self.current = self.current, None
+        if track is None:
+            return None
+        download_time = track['stages'].get('download')
+        record = {
+            'ts': time.time(),
+            'url': track['url'],
+            'id': track['id'],
+            'title': track['title'],
+            'ok': ok,
+            'error': str(error)[:300] if error else None,
+            'bytes': track['bytes'],
+            'mb_per_s': round(track['bytes'] / download_time / 1e6, 3) if download_time else None,
+            'last_speed': track['speed'],
+            'last_eta': track['eta'],
+            'stages': {k: round(v, 3) for k, v in track['stages'].items()},
+            'total': round(time.monotonic() - track['started'], 3),
+        }
+        self.stats.add(record)
+        return record
+
+
+# =============================================================================
+# 🔎 ANÁLISE DE PLAYLISTS (PARALELA E SEM DUPLICADAS)
+# =============================================================================
+
+# Quantos links são resolvidos ao mesmo tempo
+MAX_ANALYSIS_WORKERS = 4
+
+
+def build_analyze_opts():
+    """Configuração específica para análise (o ritmo vem do RATE_LIMITER)"""
+    return {
+        'extract_flat': True,
+        'quiet': True,
+        'ignoreerrors': True,
+        'extractor_args': {
+            'youtube': {
+                'skip': ['hls', 'dash'],
+                'player_client': ['android'],
+            }
+        }
+    }
+
+
+def entry_key(entry):
+    """Identidade de uma música entre playlists diferentes"""
+    return entry.get('id') or entry.get('url')
+
+
+def entry_url(entry):
+    return entry.get('url') or f"https://www.youtube.com/watch?v={entry.get('id')}"
+
+
+def extract_link(ydl, url, pacer=None):
+    """Resolve um link (playlist ou vídeo) na lista plana de entradas compactas.
+
+    Cada entrada do yt-dlp vira um dict compacto (compact_entry) enquanto a
+    lista é percorrida, e o dict original é solto na hora: o pico da análise
+    fica na lista que o yt-dlp montou, sem uma segunda cópia ao lado.
+    """
+    pacer = pacer or RATE_LIMITER
+    logger = ydl.params.get('logger')
+    if isinstance(logger, YdlLogger):
+        logger.errors.clear()
+    pacer.acquire()
+    try:
+        info = ydl.extract_info(url, download=False)
+        if not info:
+            errors = getattr(logger, 'errors', None)
+            raise DownloadFailed(errors[-1] if errors else "yt-dlp não retornou informações")
+    except Exception as e:
+        pacer.record_failure(e)
+        raise
+    pacer.record_success()
+    if 'entries' not in info:
+        return [compact_entry(info)]
+    raw = info.pop('entries')
+    del info
+    if not isinstance(raw, list):
+        return [compact_entry(e) for e in raw if e]
+    entries = []
+    raw.reverse()
+    while raw:
+        entry = raw.pop()
+        if entry:
+            entries.append(compact_entry(entry))
+    return entries
+
+
+def merge_entries(results):
+    """Junta as listas na ordem dos links numa TrackTable, mantendo só a primeira ocorrência de cada id"""
+    merged = TrackTable()
+    duplicates = 0
+    for entries in results:
+        duplicates += merged.extend(entries)
+    return merged, duplicates
+
+
+# Pasta do cache de análises (um JSON por playlist)
+PLAYLIST_CACHE_DIR = os.path.join(APPLICATION_PATH, "cache", "playlists")
+
+# Campos das entradas que valem a pena guardar
+CACHED_ENTRY_FIELDS = ('id', 'url', 'title', 'duration', 'uploader')
+
+# Na atualização incremental, para depois de ver esta sequência de músicas já conhecidas
+KNOWN_RUN_TO_STOP = 5
+
+
+def compact_entry(entry):
+    return {k: entry[k] for k in CACHED_ENTRY_FIELDS if entry.get(k) is not None}
+
+
+class TrackTable:
+    """Músicas de uma análise, guardadas em colunas.
+
+    Só os campos usados (id, url, título, duração, canal), com uma lista por
+    campo em vez de um dict por música. A URL só é guardada quando não é o
+    link padrão do id, a duração fica num array de floats e cada nome de
+    canal repetido vira uma única string. `index(chave)` acha uma música pelo
+    id (ou pela URL, se não houver id) em O(1); repetidas são recusadas na
+    entrada. Iterar devolve os dicts compactos (para o cache e a CLI).
+    """
+    __slots__ = ('ids', 'titles', 'uploaders', 'durations', '_urls', '_index', '_names')
+
+    NO_DURATION = -1.0
+
+    def __init__(self, entries=()):
+        self.ids = []
+        self.titles = []
+        self.uploaders = []
+        self.durations = array('d')
+        self._urls = {}    # posição -> URL que não sai do id
+        self._index = {}   # entry_key -> posição
+        self._names = {}   # canais já vistos (uma string por nome)
+        self.extend(entries)
+
+    def add(self, entry):
+        """Acrescenta uma entrada do yt-dlp (ou dict compacto). False se já estava na tabela"""
+        key = entry_key(entry)
+        if key is None or key in self._index:
+            return False
+        position = len(self.ids)
+        self._index[key] = position
+        video_id = entry.get('id')
+        self.ids.append(video_id)
+        self.titles.append(entry.get('title'))
+        uploader = entry.get('uploader')
+        self.uploaders.append(self._names.setdefault(uploader, uploader) if uploader else None)
+        duration = entry.get('duration')
+        self.durations.append(float(duration) if duration is not None else self.NO_DURATION)
+        url = entry.get('url')
+        if url and url != entry_url({'id': video_id}):
+            self._urls[position] = url
+        return True
+
+    def extend(self, entries):
+        """Acrescenta várias entradas. Retorna quantas foram recusadas por repetição"""
+        refused = 0
+        for entry in entries:
+            if not self.add(entry):
+                refused += 1
+        return refused
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __eq__(self, other):
+        if not isinstance(other, TrackTable):
+            return NotImplemented
+        return (self.ids == other.ids and self.titles == other.titles and self.uploaders == other.uploaders
+                and self.durations == other.durations and self._urls == other._urls)
+
+    def index(self, key):
+        """Posição da música com este id (ou URL), ou None"""
+        return self._index.get(key)
+
+    def key(self, position):
+        return self.ids[position] or self._urls.get(position)
+
+    def url(self, position):
+        return self._urls.get(position) or entry_url({'id': self.ids[position]})
+
+    def urls(self):
+        return [self.url(i) for i in range(len(self.ids))]
+
+    def entry(self, position):
+        """Dict compacto da música (os mesmos campos do cache de playlists)"""
+        duration = self.durations[position]
+        entry = {
+            'id': self.ids[position],
+            'url': self.url(position),
+            'title': self.titles[position],
+            'duration': duration if duration != self.NO_DURATION else None,
+            'uploader': self.uploaders[position],
+        }
+        return {k: v for k, v in entry.items() if v is not None}
+
+    def __iter__(self):
+        return (self.entry(i) for i in range(len(self.ids)))
+
+
+class PlaylistCache:
+    """Cache em disco das extrações planas, uma por link de playlist"""
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def _path(self, url):
+        name = hashlib.sha1(url.strip().encode('utf-8')).hexdigest()
+        return os.path.join(self.folder, f"{name}.json")
+
+    def get(self, url):
+        """Retorna {'url', 'fetched_at', 'entries'} ou None"""
+        try:
+            with open(self._path(url), 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record.get('url') != url.strip():
+            return None
+        return record
+
+    def put(self, url, entries):
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            write_json_atomic(self._path(url), {
+                'url': url.strip(),
+                'fetched_at': time.time(),
+                'entries': entries,
+            })
+        except OSError as e:
+            print(f"Erro ao salvar cache da playlist: {e}")
+
+
+PLAYLIST_CACHE = PlaylistCache(PLAYLIST_CACHE_DIR)
+
+
+def refresh_link(ydl, url, cached, pacer=None):
+    """Atualiza um link já em cache buscando só o começo da playlist.
+
+    As páginas são lidas sob demanda e a leitura para quando aparece uma
+    sequência de músicas já conhecidas (`cached` é a TrackTable do cache).
+    Se a playlist informar a contagem total e ela não bater com o
+    resultado, lê até o fim (a junção com o cache é tentada uma vez só).
+    """
+    pacer = pacer or RATE_LIMITER
+    pacer.acquire()
+    try:
+        info = ydl.extract_info(url, download=False, process=False)
+        if not info:
+            raise DownloadFailed("yt-dlp não retornou informações")
+        if info.get('_type') in ('url', 'url_transparent') or 'entries' not in info:
+            # Link que redireciona ou vídeo único: resolve do jeito normal
+            pacer.record_success()
+            return extract_link(ydl, url, pacer)
+
+        expected = info.get('playlist_count')
+        fresh = []
+        run = 0
+        checked = False
+        for entry in info['entries']:
+            if not entry:
+                continue
+            fresh.append(compact_entry(entry))
+            if checked:
+                continue
+            run = run + 1 if entry_key(entry) in cached else 0
+            if run >= KNOWN_RUN_TO_STOP:
+                # Uma junção só: se a contagem não bater (vídeos ocultos ou
+                # indisponíveis contam nela), lê o resto sem juntar de novo
+                checked = True
+                candidate, _ = merge_entries([fresh, cached])
+                if expected is None or len(candidate) == expected:
+                    fresh = list(candidate)
+                    break
+    except Exception as e:
+        pacer.record_failure(e)
+        raise
+    pacer.record_success()
+    return fresh
+
+
+def _resolve_parallel(links, indexes, results, fetch, workers, on_progress=None, job=None):
+    """Roda fetch(ydl, idx, url) para os índices pedidos, com um YoutubeDL por thread.
+
+    Cada link ocupa uma vaga do SCHEDULER com prioridade normal. Com um
+    `job`, os links param enquanto ele estiver pausado e um cancelamento
+    sai daqui como JobCancelled.
+    """
+    if not indexes:
+        return
+    local = threading.local()
+    opened = []
+    lock = threading.Lock()
+    done = [0]
+
+    def resolve(idx):
+        if job:
+            job.checkpoint()
+        ydl = getattr(local, "ydl", None)
+        if ydl is None:
+            import yt_dlp
+            opts = build_analyze_opts()
+            opts['logger'] = YdlLogger(quiet=True)
+            ydl = local.ydl = yt_dlp.YoutubeDL(opts)
+            with lock:
+                opened.append(ydl)
+        try:
+            with SCHEDULER.slots.slot(PRIORITY_NORMAL):
+                results[idx] = fetch(ydl, idx, links[idx])
+        except JobCancelled:
+            raise
+        except Exception as e:
+            print(f"Erro ao analisar {links[idx]}: {e}")
+        with lock:
+            done[0] += 1
+            finished = done[0]
+        if on_progress:
+            on_progress(finished, len(indexes))
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(indexes)))) as pool:
+            for future in [pool.submit(resolve, idx) for idx in indexes]:
+                future.result()
+    finally:
+        for ydl in opened:
+            ydl.close()
+
+
+def analyze_links(links, workers=MAX_ANALYSIS_WORKERS, pacer=None, on_progress=None,
+                  cache=None, ttl=0, on_refresh=None, on_entries=None, job=None):
+    """Resolve vários links em paralelo. Retorna (TrackTable, duplicadas removidas).
+
+    A ordem do resultado é estável: segue a ordem dos links e, dentro de
+    cada playlist, a ordem original, independente de quem terminou primeiro.
+
+    Com `cache`, links analisados há menos de `ttl` segundos nem vão à rede.
+    Os vencidos são devolvidos do cache na hora e revalidados em segundo
+    plano; se algo mudar, on_refresh(entradas, duplicadas) recebe o
+    resultado novo. Sem on_refresh, a revalidação acontece antes de retornar.
+
+    Com `on_entries`, as músicas também saem em streaming: on_entries(novas)
+    é chamado assim que cada link sai do cache ou é resolvido, só com as
+    entradas ainda não entregues. A chamada acontece na thread que resolveu,
+    ainda com a vaga de rede dela: on_entries deve só repassar as entradas
+    (como faz stream_feed), nunca esperar.
+
+    Com `job`, a análise respeita pausa e cancelamento dele (JobCancelled).
+    """
+    results = [[] for _ in links]
+    streamed = set()
+    stream_lock = threading.Lock()
+
+    def stream(entries):
+        if not on_entries:
+            return
+        with stream_lock:
+            new = []
+            for entry in entries:
+                key = entry_key(entry)
+                if key not in streamed:
+                    streamed.add(key)
+                    new.append(entry)
+        if new:
+            on_entries(new)
+
+    missing, stale = [], []
+    for idx, url in enumerate(links):
+        record = cache.get(url) if cache else None
+        if record is None:
+            missing.append(idx)
+            continue
+        results[idx] = TrackTable(record['entries'])
+        stream(record['entries'])
+        if time.time() - record['fetched_at'] >= ttl:
+            stale.append(idx)
+
+    def fetch(ydl, idx, url):
+        entries = extract_link(ydl, url, pacer)
+        if cache:
+            cache.put(url, entries)
+        stream(entries)
+        return TrackTable(entries)
+
+    def revalidate():
+        fresh = list(results)
+
+        def fetch_incremental(ydl, idx, url):
+            entries = refresh_link(ydl, url, results[idx], pacer)
+            cache.put(url, entries)
+            stream(entries)
+            return TrackTable(entries)
+
+        _resolve_parallel(links, stale, fresh, fetch_incremental, workers, job=job)
+        changed = any(fresh[idx] != results[idx] for idx in stale)
+        return fresh, changed
+
+    _resolve_parallel(links, missing, results, fetch, workers, on_progress, job)
+
+    if stale and on_refresh:
+        def background():
+            fresh, changed = revalidate()
+            if changed:
+                on_refresh(*merge_entries(fresh))
+        threading.Thread(target=background, daemon=True).start()
+    elif stale:
+        results, _ = revalidate()
+
+    return merge_entries(results)
+
+
+# =============================================================================
+# 🔍 BUSCA EM LOTE (MUITAS MÚSICAS DE UMA LISTA "ARTISTA - TÍTULO")
+# =============================================================================
+
+# Cache do primeiro resultado de cada busca
+SEARCH_CACHE_DB = os.path.join(APPLICATION_PATH, "cache", "searches.db")
+# O primeiro resultado muda pouco; buscas sem resultado são refeitas antes
+SEARCH_CACHE_TTL = 30 * 24 * 3600
+SEARCH_MISS_TTL = 24 * 3600
+# Buscas simultâneas (cada uma ainda pede vaga ao SCHEDULER e token ao RATE_LIMITER)
+MAX_SEARCH_WORKERS = 6
+
+
+class SearchCache:
+    """Cache SQLite das buscas em lote: consulta normalizada → primeira música (ou nenhuma).
+
+    Guarda só os campos da TrackTable, então reimportar a mesma lista de
+    milhares de linhas sai do disco numa consulta por bloco, sem rede.
+    """
+
+    SCHEMA = "CREATE TABLE IF NOT EXISTS searches (query TEXT PRIMARY KEY, entry TEXT, ts REAL)"
+
+    def __init__(self, path, ttl=SEARCH_CACHE_TTL, miss_ttl=SEARCH_MISS_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _conn(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(self.SCHEMA)
+            self._db = db
+        return self._db
+
+    def get_many(self, queries):
+        """{busca: entrada ou None} das buscas recentes; as ausentes e vencidas ficam de fora"""
+        keys = {normalize_text(query): query for query in queries}
+        names = list(keys)
+        rows = []
+        with self._lock:
+            db = self._conn()
+            # O SQLite limita o número de parâmetros por consulta
+            for start in range(0, len(names), 500):
+                chunk = names[start:start + 500]
+                rows += db.execute(f"SELECT query, entry, ts FROM searches WHERE query IN "
+                                   f"({','.join('?' * len(chunk))})", chunk).fetchall()
+        now = time.time()
+        found = {}
+        for key, entry, ts in rows:
+            if now - ts <= (self.ttl if entry else self.miss_ttl):
+                found[keys[key]] = json.loads(entry) if entry else None
+        return found
+
+    def put(self, query, entry):
+        data = json.dumps(entry, ensure_ascii=False) if entry else None
+        with self._lock, self._conn() as db:
+            db.execute("INSERT OR REPLACE INTO searches VALUES (?, ?, ?)", (normalize_text(query), data, time.time()))
+
+
+SEARCH_CACHE = SearchCache(SEARCH_CACHE_DB)
+
+
+def resolve_queries(queries, workers=MAX_SEARCH_WORKERS, pacer=None, on_progress=None, cache=SEARCH_CACHE,
+                    library=LIBRARY, job=None):
+    """Resolve uma lista de buscas (ou links) em músicas, em paralelo e sem baixar nada.
+
+    Cada linha vira uma música: o primeiro resultado do mesmo ytsearch da
+    aba de música única. Linhas repetidas contam uma vez, "artista - título"
+    que já está na biblioteca nem vai à rede e o que está no `cache` também
+    não. O resto é resolvido como os links de playlist (um YoutubeDL por
+    thread, vaga no SCHEDULER e ritmo do `pacer`); on_progress(feitas, total)
+    acompanha só as buscas que foram à rede.
+
+    Retorna (TrackTable na ordem das linhas, músicas repetidas entre buscas,
+    buscas já na biblioteca, buscas sem resultado).
+    """
+    unique = {}
+    for query in queries:
+        query = query.strip()
+        if query:
+            unique.setdefault(normalize_text(query), query)
+
+    owned, pending = [], []
+    for query in unique.values():
+        (owned if find_in_library(query, library) else pending).append(query)
+
+    found = {}
+    if cache:
+        try:
+            found = cache.get_many(pending)
+        except sqlite3.Error as e:
+            print(f"Erro ao ler o cache de buscas: {e}")
+    results = [found.get(query) for query in pending]
+    missing = [idx for idx, query in enumerate(pending) if query not in found]
+    links = [search_query(query) for query in pending]
+
+    def fetch(ydl, idx, url):
+        entries = extract_link(ydl, url, pacer)
+        entry = entries[0] if entries else None
+        if cache:
+            try:
+                cache.put(pending[idx], entry)
+            except sqlite3.Error as e:
+                print(f"Erro ao gravar o cache de buscas: {e}")
+        return entry
+
+    _resolve_parallel(links, missing, results, fetch, workers, on_progress, job)
+
+    not_found = [query for query, entry in zip(pending, results) if not entry]
+    table, duplicates = merge_entries([[entry] for entry in results if entry])
+    return table, duplicates, owned, not_found
+
+
+# =============================================================================
+# 🖼️ CAPAS (HTTP COMPARTILHADO E CACHE EM DOIS NÍVEIS)
+# =============================================================================
+
+# Pasta das imagens (endereçadas pelo SHA-256 do conteúdo) e do índice
+COVER_CACHE_DIR = os.path.join(APPLICATION_PATH, "cache", "covers")
+
+# Limite do cache em disco; as imagens usadas há mais tempo saem primeiro
+COVER_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# Imagens recentes mantidas na memória
+COVER_MEMORY_BYTES = 32 * 1024 * 1024
+
+# Por quanto tempo uma busca "música -> capa" é reaproveitada
+COVER_SEARCH_TTL = 7 * 24 * 3600
+
+# Conexões mantidas abertas por host no cliente HTTP compartilhado
+HTTP_POOL_SIZE = 16
+
+_http_session = None
+_http_lock = threading.Lock()
+
+
+def http_session():
+    """requests.Session compartilhada (keep-alive e pool de conexões por host)"""
+    global _http_session
+    with _http_lock:
+        if _http_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _http_session = session
+        return _http_session
+
+
+class MemoryLRU:
+    """Cache LRU em memória limitado pelo total de bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class CoverCache:
+    """Cache das capas: buscas, LRU em memória e arquivos endereçados por conteúdo.
+
+    `searches` guarda a URL da capa encontrada para cada busca; `images`
+    liga cada URL ao hash do conteúdo. URLs diferentes com a mesma imagem
+    apontam para um único arquivo. Quando o disco passa de `max_bytes`, saem
+    as imagens usadas há mais tempo.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS searches (
+            query TEXT PRIMARY KEY, thumbnail TEXT NOT NULL, title TEXT, ts REAL);
+        CREATE TABLE IF NOT EXISTS images (
+            url TEXT PRIMARY KEY, hash TEXT NOT NULL, size INTEGER, used REAL);
+        CREATE INDEX IF NOT EXISTS images_hash ON images(hash);
+        CREATE INDEX IF NOT EXISTS images_used ON images(used);
+    """
+
+    def __init__(self, folder, max_bytes=COVER_CACHE_MAX_BYTES, memory_bytes=COVER_MEMORY_BYTES,
+                 search_ttl=COVER_SEARCH_TTL):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.search_ttl = search_ttl
+        self.memory = MemoryLRU(memory_bytes)
+        self._lock = threading.RLock()
+        self._db = None
+
+    def _conn(self):
+        if self._db is None:
+            os.makedirs(self.folder, exist_ok=True)
+            db = sqlite3.connect(os.path.join(self.folder, "index.db"), check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(self.SCHEMA)
+            self._db = db
+        return self._db
+
+    def _blob_path(self, digest):
+        return os.path.join(self.folder, digest[:2], digest + ".img")
+
+    def get_search(self, query):
+        """(url da capa, título) de uma busca recente, ou None"""
+        key = normalize_text(query)
+        with self._lock:
+            row = self._conn().execute("SELECT thumbnail, title, ts FROM searches WHERE query = ?",
+                                       (key,)).fetchone()
+        if row is None or time.time() - row[2] > self.search_ttl:
+            return None
+        return row[0], row[1]
+
+    def put_search(self, query, thumbnail, title=None):
+        with self._lock, self._conn() as db:
+            db.execute("INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?)",
+                       (normalize_text(query), thumbnail, title, time.time()))
+
+    def get_image(self, url):
+        """Bytes da imagem da memória ou do disco, sem rede; None se não estiver no cache"""
+        data = self.memory.get(url)
+        if data is not None:
+            return data
+        with self._lock:
+            row = self._conn().execute("SELECT hash FROM images WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            try:
+                with open(self._blob_path(row[0]), 'rb') as f:
+                    data = f.read()
+            except OSError:
+                with self._db:
+                    self._db.execute("DELETE FROM images WHERE url = ?", (url,))
+                return None
+            with self._db:
+                self._db.execute("UPDATE images SET used = ? WHERE url = ?", (time.time(), url))
+        self.memory.put(url, data)
+        return data
+
+    def put_image(self, url, data):
+        """Guarda a imagem e devolve o hash do conteúdo"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        self.memory.put(url, data)
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+                with open(tmp, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            with self._conn() as db:
+                db.execute("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?)",
+                           (url, digest, len(data), time.time()))
+            self._evict()
+        return digest
+
+    def _evict(self):
+        # Tamanho real: cada hash conta uma vez, mesmo com várias URLs
+        db = self._db
+        blobs = db.execute("SELECT hash, MAX(size), MAX(used) FROM images GROUP BY hash ORDER BY MAX(used)").fetchall()
+        total = sum(size for _, size, _ in blobs)
+        with db:
+            for digest, size, _ in blobs:
+                if total <= self.max_bytes:
+                    break
+                db.execute("DELETE FROM images WHERE hash = ?", (digest,))
+                try:
+                    os.remove(self._blob_path(digest))
+                except OSError:
+                    pass
+                total -= size
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+COVER_CACHE = CoverCache(COVER_CACHE_DIR)
+
+
+def build_cover_opts():
+    """Configuração da busca de capas (só metadados, nada é baixado)"""
+    return {
+        'quiet': True,
+        'extractor_args': {
+            'youtube': {
+                'player_client': ['android'],
+            }
+        }
+    }
+
+
+def fetch_cover(query, ydl=None, pacer=None, cache=COVER_CACHE, priority=PRIORITY_BULK):
+    """Bytes da capa do primeiro resultado da busca. Retorna (bytes, url da capa) ou (None, None).
+
+    A busca e a imagem vêm do cache quando possível; só o que falta vai à
+    rede. `ydl` permite reaproveitar um YoutubeDL entre várias buscas.
+    A busca ocupa uma vaga do SCHEDULER e pede o ritmo com `priority`.
+    """
+    found = cache.get_search(query) if cache else None
+    if found:
+        thumbnail_url = found[0]
+    else:
+        own = ydl is None
+        if own:
+            import yt_dlp
+            ydl = yt_dlp.YoutubeDL(build_cover_opts())
+        try:
+            if pacer:
+                pacer.acquire(priority)
+            try:
+                with SCHEDULER.slots.slot(priority):
+                    result = ydl.extract_info(f"ytsearch1:{query}", download=False)
+            except Exception as e:
+                if pacer:
+                    pacer.record_failure(e)
+                raise
+            if pacer:
+                pacer.record_success()
+        finally:
+            if own:
+                ydl.close()
+        entries = (result or {}).get('entries') or []
+        info = entries[0] if entries else {}
+        thumbnail_url = info.get('thumbnail')
+        if not thumbnail_url:
+            return None, None
+        if cache:
+            cache.put_search(query, thumbnail_url, info.get('title'))
+
+    data = cache.get_image(thumbnail_url) if cache else None
+    if data is None:
+        resp = http_session().get(thumbnail_url, timeout=10)
+        resp.raise_for_status()
+        data = resp.content
+        if cache:
+            cache.put_image(thumbnail_url, data)
+    return data, thumbnail_url
+
+
+# Buscas/downloads de capa simultâneos na exportação em lote
+MAX_COVER_FETCHES = 8
+
+# Qualidade dos JPGs gravados (exportação) e dos embutidos nas músicas
+COVER_JPEG_QUALITY = 95
+EMBED_JPEG_QUALITY = 85
+
+# A partir de quantas imagens a conversão vai para um pool de processos
+COVER_PROCESS_POOL_MIN = 16
+
+
+def youtube_thumbnail_url(video_id):
+    """Capa de um vídeo do YouTube direto pelo ID, sem precisar de busca"""
+    return f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"
+
+
+def cover_items_from_entries(entries):
+    """(nome, busca, url da capa) para as entradas de uma análise de playlist"""
+    items = []
+    for entry in entries:
+        name = entry.get('title') or entry.get('id') or 'capa'
+        video_id = video_id_from_url(entry_url(entry))
+        items.append((name, name, youtube_thumbnail_url(video_id) if video_id else None))
+    return items
+
+
+def cover_items_from_queries(queries):
+    return [(query, query, None) for query in queries]
+
+
+def safe_filename(name, limit=80):
+    name = "".join(c if c.isalnum() or c in " -_." else "_" for c in name).strip(" .")
+    return name[:limit] or "capa"
+
+
+def prepare_cover(data, max_size=0, quality=COVER_JPEG_QUALITY):
+    """Decodifica a imagem e devolve os bytes de um JPG RGB de no máximo max_size px no maior lado.
+
+    Fontes JPEG são decodificadas já reduzidas (modo draft do Pillow, em
+    escalas de 1/2 a 1/8), sem passar pela resolução cheia. max_size 0
+    mantém o tamanho original.
+    """
+    from PIL import Image
+    with Image.open(BytesIO(data)) as img:
+        if max_size:
+            if img.format == "JPEG":
+                img.draft("RGB", (max_size, max_size))
+            img.thumbnail((max_size, max_size), Image.LANCZOS)
+        out = BytesIO()
+        img.convert("RGB").save(out, "JPEG", quality=quality, optimize=True)
+    return out.getvalue()
+
+
+def _conversion_pool(count):
+    """Pool para converter `count` imagens: processos em lotes grandes, threads nos pequenos"""
+    workers = max(1, min(os.cpu_count() or 2, count or 1))
+    if count >= COVER_PROCESS_POOL_MIN:
+        try:
+            return ProcessPoolExecutor(max_workers=workers)
+        except (OSError, NotImplementedError) as e:
+            print(f"Pool de processos indisponível, usando threads: {e}")
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+# Capas preparadas mantidas na memória durante um job (o original fica no COVER_CACHE)
+ALBUM_ART_MEMORY_BYTES = 32 * 1024 * 1024
+
+
+class AlbumArtCache:
+    """Capas das músicas de um job, preparadas uma vez e reaproveitadas.
+
+    Músicas do mesmo álbum (mesmo artista e álbum nos metadados) ou com a
+    mesma URL de capa usam a primeira capa obtida, sem nova busca. Imagens
+    de URLs diferentes com o mesmo conteúdo (mesmo SHA-256) são
+    convertidas uma vez só. Os originais passam pelo COVER_CACHE.
+    """
+
+    def __init__(self, max_size=0, quality=EMBED_JPEG_QUALITY, cache=COVER_CACHE,
+                 memory_bytes=ALBUM_ART_MEMORY_BYTES):
+        self.max_size = max_size
+        self.quality = quality
+        self.cache = cache
+        self.prepared = MemoryLRU(memory_bytes)  # hash do original -> JPG preparado
+        self._keys = {}  # álbum ou URL -> (hash do original, URL)
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self.fetched = 0
+        self.converted = 0
+        self.reused = 0
+
+    @staticmethod
+    def album_key(info):
+        album = normalize_text(info.get('album'))
+        if album:
+            artist = normalize_text(info.get('album_artist') or info.get('artist') or info.get('uploader'))
+            return ('album', artist, album)
+        return ('url', info.get('thumbnail'))
+
+    def get(self, info):
+        """JPG preparado da capa da música, ou None se ela não tiver capa"""
+        url = info.get('thumbnail')
+        if not url:
+            return None
+        key = self.album_key(info)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # Duas músicas do mesmo álbum ao mesmo tempo: a segunda espera a primeira
+        with key_lock:
+            with self._lock:
+                known = self._keys.get(key)
+            if known:
+                jpg = self.prepared.get(known[0])
+                if jpg is not None:
+                    with self._lock:
+                        self.reused += 1
+                    return jpg
+                url = known[1]
+            data = self._original(url)
+            digest = hashlib.sha256(data).hexdigest()
+            with self._lock:
+                hash_lock = self._key_locks.setdefault(('hash', digest), threading.Lock())
+            with hash_lock:
+                jpg = self.prepared.get(digest)
+                if jpg is None:
+                    jpg = prepare_cover(data, self.max_size, self.quality)
+                    self.prepared.put(digest, jpg)
+                    with self._lock:
+                        self.converted += 1
+                else:
+                    with self._lock:
+                        self.reused += 1
+            with self._lock:
+                self._keys[key] = (digest, url)
+            return jpg
+
+    def _original(self, url):
+        data = self.cache.get_image(url) if self.cache else None
+        if data is None:
+            resp = http_session().get(url, timeout=10)
+            resp.raise_for_status()
+            data = resp.content
+            with self._lock:
+                self.fetched += 1
+            if self.cache:
+                self.cache.put_image(url, data)
+        return data
+
+
+def make_album_art_stage(ydl, album_art, in_memory=False):
+    """Pós-processador (antes do download) que grava a capa preparada do AlbumArtCache.
+
+    A capa vira a única miniatura da música, então o EmbedThumbnail embute
+    esse JPG (já no tamanho de embed_cover_size) e depois apaga o arquivo.
+    Com `in_memory`, nenhum arquivo é gravado: os bytes ficam no info para
+    o TagWriter.
+    """
+    from yt_dlp.postprocessor import PostProcessor
+    from yt_dlp.utils import replace_extension
+
+    class AlbumArtPP(PostProcessor):
+        def run(self, info):
+            try:
+                jpg = album_art.get(info)
+            except Exception as e:
+                self.report_warning(f"Capa indisponível: {e}")
+                return [], info
+            if not jpg:
+                return [], info
+            if in_memory:
+                info['__cover'] = jpg
+                return [], info
+            path = replace_extension(self._downloader.prepare_filename(info, 'temp'), 'jpg', info.get('ext'))
+            with open(path, 'wb') as f:
+                f.write(jpg)
+            final = replace_extension(self._downloader.prepare_filename(info, 'thumbnail'), 'jpg', info.get('ext'))
+            info.setdefault('__files_to_move', {})[path] = final
+            info['thumbnails'] = [{'id': 'album_art', 'url': info.get('thumbnail'), 'filepath': path}]
+            return [], info
+
+    return AlbumArtPP(ydl)
+
+
+def export_covers(items, folder, workers=MAX_COVER_FETCHES, pacer=None, cache=COVER_CACHE, on_progress=None,
+                  max_size=0, job=None):
+    """Baixa e grava as capas de vários itens (nome, busca, url da capa) em `folder`.
+
+    1. Busca/baixa tudo em paralelo (no máximo `workers` ao mesmo tempo, um
+       YoutubeDL por thread, tudo passando pelo cache de capas).
+    2. Agrupa imagens idênticas pelo SHA-256 do conteúdo.
+    3. Converte cada imagem única para JPG (reduzida a max_size px, se
+       definido) num pool de workers do Pillow; processos em lotes grandes.
+    4. Grava os JPGs de uma vez, um por imagem única, com o nome do primeiro item.
+
+    on_progress(etapa, feitos, total) acompanha as etapas "fetch" e "convert".
+    Com `job`, as buscas respeitam pausa e cancelamento dele (JobCancelled).
+    Retorna (caminhos gravados, itens com imagem repetida, falhas "nome: erro").
+    """
+    local = threading.local()
+    opened = []
+    lock = threading.Lock()
+    done = [0]
+    results = [None] * len(items)
+    failed = []
+
+    def fetch(idx):
+        if job:
+            job.checkpoint()
+        name, query, thumbnail_url = items[idx]
+        try:
+            data = None
+            if thumbnail_url:
+                data = cache.get_image(thumbnail_url) if cache else None
+                if data is None:
+                    try:
+                        resp = http_session().get(thumbnail_url, timeout=10)
+                        resp.raise_for_status()
+                        data = resp.content
+                        if cache:
+                            cache.put_image(thumbnail_url, data)
+                    except Exception as e:
+                        print(f"Capa direta indisponível para {name}, buscando: {e}")
+            if data is None:
+                ydl = getattr(local, "ydl", None)
+                if ydl is None:
+                    import yt_dlp
+                    opts = build_cover_opts()
+                    opts['logger'] = YdlLogger(quiet=True)
+                    ydl = local.ydl = yt_dlp.YoutubeDL(opts)
+                    with lock:
+                        opened.append(ydl)
+                data, _ = fetch_cover(query, ydl=ydl, pacer=pacer, cache=cache)
+            if data is None:
+                raise ValueError("nenhuma capa encontrada")
+            results[idx] = data
+        except Exception as e:
+            with lock:
+                failed.append(f"{name}: {str(e)[:100]}")
+        with lock:
+            done[0] += 1
+            finished = done[0]
+        if on_progress:
+            on_progress("fetch", finished, len(items))
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(items) or 1))) as pool:
+            list(pool.map(fetch, range(len(items))))
+    finally:
+        for ydl in opened:
+            ydl.close()
+
+    # Uma conversão e um arquivo por imagem distinta, na ordem dos itens
+    unique = {}
+    duplicates = []
+    for idx, data in enumerate(results):
+        if data is None:
+            continue
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in unique:
+            duplicates.append(items[idx][0])
+        else:
+            unique[digest] = idx
+
+    os.makedirs(folder, exist_ok=True)
+    written = []
+    used_names = set()
+    order = list(unique.values())
+    with _conversion_pool(len(order)) as pool:
+        futures = [pool.submit(prepare_cover, results[idx], max_size) for idx in order]
+        for n, (idx, future) in enumerate(zip(order, futures), 1):
+            name = items[idx][0]
+            try:
+                jpg = future.result()
+                base = safe_filename(name)
+                filename, suffix = f"{base}.jpg", 2
+                while filename.lower() in used_names or os.path.exists(os.path.join(folder, filename)):
+                    filename, suffix = f"{base} ({suffix}).jpg", suffix + 1
+                used_names.add(filename.lower())
+                path = os.path.join(folder, filename)
+                with open(path, 'wb') as f:
+                    f.write(jpg)
+                written.append(path)
+            except Exception as e:
+                failed.append(f"{name}: {str(e)[:100]}")
+            if on_progress:
+                on_progress("convert", n, len(order))
+    return written, duplicates, failed
+
+
+# =============================================================================
+# 🏷️ TAGS E CAPA NUMA ÚNICA ESCRITA (MUTAGEN, EM SEGUNDO PLANO)
+# =============================================================================
+
+# Músicas gravadas por vez pelo TagWriter (em ordem de caminho)
+TAG_BATCH_SIZE = 32
+
+
+def track_tags(info):
+    """Os mesmos campos que o FFmpegMetadata gravava, tirados do info do yt-dlp"""
+    def first(*keys):
+        for key in keys:
+            value = info.get(key)
+            if isinstance(value, (list, tuple)):
+                value = ", ".join(str(v) for v in value if v)
+            if value:
+                return str(value)
+        return None
+
+    date = first('release_date', 'upload_date')
+    if date and len(date) == 8 and date.isdigit():
+        date = f"{date[:4]}-{date[4:6]}-{date[6:]}"
+    tags = {
+        'title': first('track', 'title'),
+        'artist': first('artist', 'artists', 'creator', 'creators', 'uploader', 'uploader_id'),
+        'album': first('album'),
+        'date': date or first('release_year'),
+        'genre': first('genre', 'genres'),
+        'tracknumber': first('track_number'),
+        'comment': first('webpage_url'),
+    }
+    return {key: value for key, value in tags.items() if value}
+
+
+def _write_id3(path, tags, cover):
+    from mutagen.id3 import ID3, ID3NoHeaderError, APIC, COMM, TALB, TCON, TDRC, TIT2, TPE1, TRCK
+    try:
+        id3 = ID3(path)
+    except ID3NoHeaderError:
+        id3 = ID3()
+    frames = {'title': TIT2, 'artist': TPE1, 'album': TALB, 'date': TDRC, 'genre': TCON, 'tracknumber': TRCK}
+    for key, frame in frames.items():
+        if key in tags:
+            id3.setall(frame.__name__, [frame(encoding=3, text=tags[key])])
+    if 'comment' in tags:
+        id3.setall('COMM', [COMM(encoding=3, lang='eng', desc='', text=tags['comment'])])
+    if cover:
+        id3.setall('APIC', [APIC(encoding=3, mime='image/jpeg', type=3, desc='Cover', data=cover)])
+    # ID3v2.3: o que o Windows Explorer e a maioria dos players leem
+    id3.save(path, v2_version=3)
+
+
+def _write_mp4(path, tags, cover):
+    from mutagen.mp4 import MP4, MP4Cover
+    atoms = {'title': '\xa9nam', 'artist': '\xa9ART', 'album': '\xa9alb', 'date': '\xa9day',
+             'genre': '\xa9gen', 'comment': '\xa9cmt'}
+    audio = MP4(path)
+    if audio.tags is None:
+        audio.add_tags()
+    for key, atom in atoms.items():
+        if key in tags:
+            audio.tags[atom] = [tags[key]]
+    if tags.get('tracknumber', '').isdigit():
+        audio.tags['trkn'] = [(int(tags['tracknumber']), 0)]
+    if cover:
+        audio.tags['covr'] = [MP4Cover(cover, imageformat=MP4Cover.FORMAT_JPEG)]
+    audio.save()
+
+
+def _write_vorbis(path, tags, cover):
+    import base64
+    import mutagen
+    from mutagen.flac import Picture
+    audio = mutagen.File(path)
+    if audio is None:
+        raise ValueError("arquivo não reconhecido")
+    if audio.tags is None:
+        audio.add_tags()
+    for key, value in tags.items():
+        audio.tags[key] = [value]
+    if cover:
+        picture = Picture()
+        picture.type = 3  # Capa (frente)
+        picture.mime = 'image/jpeg'
+        picture.data = cover
+        if path.lower().endswith('.flac'):
+            audio.clear_pictures()
+            audio.add_picture(picture)
+        else:
+            audio.tags['metadata_block_picture'] = [base64.b64encode(picture.write()).decode('ascii')]
+    audio.save()
+
+
+# Gravador de tags para cada extensão de saída
+TAG_FORMATS = {
+    '.mp3': _write_id3,
+    '.m4a': _write_mp4,
+    '.mp4': _write_mp4,
+    '.opus': _write_vorbis,
+    '.ogg': _write_vorbis,
+    '.flac': _write_vorbis,
+}
+
+
+def write_tags(path, tags, cover=None):
+    """Grava tags e capa no próprio arquivo, numa única escrita"""
+    writer = TAG_FORMATS.get(os.path.splitext(path)[1].lower())
+    if writer is None:
+        raise ValueError(f"formato sem suporte a tags: {os.path.splitext(path)[1]}")
+    writer(path, tags, cover)
+
+
+class TagWriter:
+    """Grava as tags das músicas prontas numa thread de fundo.
+
+    As músicas se acumulam numa fila e são gravadas em lotes de até
+    `batch_size`, em ordem de caminho e uma de cada vez, então o disco de
+    destino recebe uma escrita por arquivo em vez das duas cópias completas
+    que o EmbedThumbnail e o FFmpegMetadata faziam. Os workers de conversão
+    não esperam por ela: `submit` devolve um Future que termina quando as
+    tags forem gravadas (ou com o erro), e quem precisa de tudo pronto
+    chama `flush`.
+    """
+
+    def __init__(self, batch_size=TAG_BATCH_SIZE):
+        self.batch_size = max(1, batch_size)
+        self._cond = threading.Condition()
+        self._pending = []
+        self._busy = False
+        self._thread = None
+        self.written = 0
+        self.failed = 0
+        self.seconds = 0.0
+
+    def submit(self, path, tags, cover=None):
+        done = Future()
+        with self._cond:
+            self._pending.append((path, tags, cover, done))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        return done
+
+    def flush(self, timeout=None):
+        """Espera as tags de tudo o que já foi enviado. Retorna False se o tempo acabou"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                self._busy = True
+            for path, tags, cover, done in sorted(batch, key=lambda job: job[0]):
+                start = time.monotonic()
+                error = None
+                try:
+                    write_tags(path, tags, cover)
+                except Exception as e:
+                    error = e
+                    print(f"Erro ao gravar tags em {os.path.basename(path)}: {e}")
+                with self._cond:
+                    self.seconds += time.monotonic() - start
+                    if error is None:
+                        self.written += 1
+                    else:
+                        self.failed += 1
+                # Fora do lock: os callbacks do Future avisam o motor
+                if error is None:
+                    done.set_result(path)
+                else:
+                    done.set_exception(error)
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+
+# Compartilhado por todas as sessões (uma fila só para o disco de destino)
+TAG_WRITER = TagWriter()
+
+
+def make_tag_stage(ydl, writer, results=None):
+    """Pós-processador (depois de mover) que entrega tags e capa ao TagWriter.
+
+    Com `results` (uma lista), o Future de cada gravação é acrescentado a
+    ela, para quem precisa saber se as tags foram gravadas.
+    """
+    from yt_dlp.postprocessor import PostProcessor
+
+    class TagsPP(PostProcessor):
+        def run(self, info):
+            done = writer.submit(info['filepath'], track_tags(info), info.pop('__cover', None))
+            if results is not None:
+                results.append(done)
+            return [], info
+
+    return TagsPP(ydl)
+
+
+def tags_error(futures):
+    """Espera as gravações e devolve um TagWriteFailed com o primeiro erro, ou None"""
+    for future in futures:
+        error = future.exception()
+        if error is not None:
+            return TagWriteFailed(f"Tags não gravadas: {error}")
+    return None
+
+
+# =============================================================================
+# ▶️ EXECUÇÃO DE JOBS (COMPARTILHADA ENTRE INTERFACE E LINHA DE COMANDO)
+# =============================================================================
+
+def search_query(query):
+    """Links passam direto; texto vira uma busca pelo primeiro resultado de áudio"""
+    return query if query.startswith("http") else f"ytsearch1:{query} audio"
+
+
+def find_in_library(query, library=LIBRARY):
+    """Arquivo já baixado para o link (pelo ID) ou para a busca "artista - título" """
+    try:
+        if query.startswith("http"):
+            return library.has(video_id_from_url(query))
+        artist, sep, title = query.partition(" - ")
+        return library.find_by_name(artist, title) if sep else None
+    except sqlite3.Error as e:
+        print(f"Erro ao consultar a biblioteca: {e}")
+        return None
+
+
+def scan_library(path, library=LIBRARY):
+    try:
+        library.scan(path)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Erro ao atualizar a biblioteca: {e}")
+
+
+def stream_feed(links, on_entries=None, cache=PLAYLIST_CACHE, ttl=None, pacer=None, job=None):
+    """feed de run_download_job que analisa `links` e põe cada música na fila assim que aparece.
+
+    A análise roda numa thread própria e só empilha o que encontra; é a
+    thread do feed que chama on_entries(entradas) e add(). Assim, pausar o
+    job (add() espera no checkpoint) nunca segura um resolvedor com vaga
+    de rede do SCHEDULER.
+    """
+    if ttl is None:
+        ttl = CONFIG.get('playlist_cache_minutes', 60) * 60
+
+    def feed(add):
+        found = queue.Queue()
+        finished = object()
+        errors = []
+
+        def analyze():
+            try:
+                analyze_links(links, pacer=pacer, cache=cache, ttl=ttl, on_entries=found.put, job=job)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                found.put(finished)
+
+        threading.Thread(target=analyze, daemon=True).start()
+        while True:
+            entries = found.get()
+            if entries is finished:
+                break
+            if on_entries:
+                on_entries(entries)
+            add([entry_url(entry) for entry in entries])
+        if errors:
+            raise errors[0]
+
+    return feed
+
+
+def run_download_job(journal, indexes=None, stats=None, on_progress=None, library=LIBRARY, feed=None, job=None):
+    """Baixa os itens de um diário com as opções gravadas nele e bloqueia até o fim.
+
+    `indexes` limita aos itens ainda pendentes (ao retomar). O diário é
+    apagado se tudo terminou ou fechado para poder ser retomado depois.
+    Com `feed`, o job fica aberto enquanto feed(add) roda numa thread:
+    cada add(urls) grava as URLs no diário e já as põe na fila (análise e
+    download ao mesmo tempo). Um diário de streaming cuja análise não
+    terminou (retomado) ganha sozinho o feed dos links guardados nele; as
+    URLs que já estavam no diário não entram de novo. O diário só é apagado
+    se o feed terminou. Com `job`, pausar segura os workers e o feed, e
+    cancelar para tudo e deixa o diário pronto para retomar.
+    Retorna (engine, falhas) com as falhas no formato de DownloadEngine.run.
+    """
+    options = journal.options
+    if indexes is None:
+        indexes = range(len(journal.urls))
+    urls = [journal.urls[i] for i in indexes]
+    if stats is None:
+        stats = JobStats()
+    # Capas compartilhadas por todas as músicas (e workers) do job
+    album_art = AlbumArtCache(CONFIG.get('embed_cover_size', 0))
+
+    def job_opts(recorder):
+        return build_download_opts(options['download_path'], recorder, options.get('codec'), options.get('quality'),
+                                   staging=True, priority=job.priority if job else PRIORITY_BULK)
+
+    def new_session():
+        # Uma sessão de rede por worker, com hooks que medem cada etapa das músicas
+        recorder = TrackRecorder(stats)
+        return DownloaderSession(job_opts(recorder), recorder, library, album_art, deferred=True)
+
+    # Conversões em paralelo com os downloads, uma por núcleo
+    transcoder = TranscodePool(job_opts, stats, library=library)
+
+    # Arquivos novos ou apagados na pasta entram no índice antes de começar
+    scan_library(options['download_path'], library)
+
+    RATE_LIMITER.start_job(options['delay'])
+    engine = DownloadEngine(new_session, workers=options['workers'], max_retries=options['max_retries'],
+                            pacer=RATE_LIMITER, on_progress=on_progress, journal=journal,
+                            library=library, transcoder=transcoder, job=job)
+    if feed is None and journal.feeding:
+        feed = stream_feed(options['links'], job=job)
+    if feed is not None:
+        def add(new_urls):
+            if job:
+                job.checkpoint()
+            if engine.stopped:
+                raise JobCancelled(journal.job['id'])
+            start, new_urls = journal.extend(new_urls)
+            engine.add(new_urls, range(start, start + len(new_urls)))
+
+        def produce():
+            try:
+                feed(add)
+                journal.mark_fed()
+            except JobCancelled:
+                pass
+            except Exception as e:
+                print(f"Erro ao alimentar o job: {e}")
+            finally:
+                engine.close_input()
+
+        engine.open_input()
+        threading.Thread(target=produce, daemon=True).start()
+    try:
+        _, _, failed = engine.run(urls, indexes)
+    finally:
+        transcoder.close()
+        TAG_WRITER.flush()
+        if journal.is_unfinished():
+            journal.close()
+        else:
+            journal.finish()
+    return engine, failed
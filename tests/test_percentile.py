@@ -0,0 +1,20 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from midnight_core import percentile  # noqa: E402
+
+
+def test_percentile_even_length():
+    values = list(range(1, 11))
+    assert percentile(values, 50) == 5
+    assert percentile(values, 95) == 10
+    assert percentile(values, 10) == 1
+
+
+def test_percentile_odd_length_and_edges():
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile([5, 1, 4, 2, 3], 0) == 1
+    assert percentile([5, 1, 4, 2, 3], 100) == 5
+    assert percentile([], 50) is None